@@ -0,0 +1,424 @@
+"""Local stand-ins for Europe PMC, IUCN v4 and an OpenAI-compatible chat and Batch API.
+
+All of them are served from one threaded HTTP server under different path prefixes. Responses are
+deterministic functions of the request (so runs are comparable); latency, error rate and an
+LLM requests-per-minute limit are configurable per service.
+"""
+import os
+import re
+import sys
+import json
+import glob
+import time
+import random
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+EUROPEPMC_PREFIX = "/europepmc/webservices/rest"
+PDF_PATH = "/backend/ptpmcrender.fcgi"
+IUCN_PREFIX = "/iucn/api/v4"
+OPENAI_PREFIX = "/v1"
+
+
+@dataclass
+class ServiceConfig:
+    latency: float = 0.05  # mean seconds per response (exponentially distributed)
+    error_rate: float = 0.0  # fraction of requests answered with HTTP 503
+    rpm: int = 0  # requests per minute before answering 429; 0 = unlimited
+
+
+@dataclass
+class MockConfig:
+    europepmc: ServiceConfig = field(default_factory=ServiceConfig)
+    iucn: ServiceConfig = field(default_factory=ServiceConfig)
+    llm: ServiceConfig = field(default_factory=lambda: ServiceConfig(latency=0.3))
+    papers_per_query: int = 20
+    xml_fraction: float = 0.5  # papers with JATS full text; the rest only have a PDF
+    pdf_fraction: float = 0.9  # papers whose PDF can be rendered
+    iucn_fraction: float = 0.3  # species with an IUCN assessment
+    answer_rate: float = 0.4  # fraction of paper extractions that find a value
+    abstract_answer_rate: float = 0.15  # fraction of abstracts that state the value
+    species_mention_rate: float = 0.7  # fraction of papers whose title and abstract name the species
+    pdf_pages: int = 8  # pages of generated PDFs when no fixtures are present
+    batch_seconds: float = 1.0  # time a submitted batch takes to complete
+    fixtures_dir: str = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+PAPER_FACT_RE = re.compile(r"Body mass of adult specimens was [\d.]+ g")
+
+
+def _unit(*parts) -> float:
+    """Deterministic number in [0, 1) for the given request parts."""
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def synthetic_pdf(lines_per_page: list) -> bytes:
+    """A minimal valid PDF with one page per list of text lines (Helvetica, no compression)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in lines_per_page:
+        text = "BT /F1 10 Tf 50 780 Td 12 TL " + " ".join(
+            "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") '" for line in lines
+        ) + " ET"
+        objects.append(f"<< /Length {len(text)} >>\nstream\n{text}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+FILLER = ("Specimens were collected in the field and measured following standard protocols. "
+          "Statistical analyses were performed in R. Results are summarised in the tables below.")
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # clients that time out or give up mid-response are expected under load
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockServices:
+    """Threaded HTTP server answering Europe PMC, IUCN, chat-completion and Batch API requests.
+
+    `calls` counts requests per endpoint (including errors and 429s) and can be reset between runs;
+    requests inside batches are counted as llm_batch_requests.
+    """
+
+    def __init__(self, config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._llm_window = []  # request times in the last minute, for the rpm limit
+        self._files = {}  # file id -> bytes (uploaded batch inputs and batch outputs)
+        self._batches = {}  # batch id -> batch object
+        self._fixtures = [open(p, "rb").read() for p in sorted(glob.glob(os.path.join(self.config.fixtures_dir, "*.pdf")))]
+        self._server = _QuietServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Environment variables pointing trAIt at these services."""
+        return {
+            "EUROPEPMC_API_URL": self.url + EUROPEPMC_PREFIX,
+            "EUROPEPMC_PDF_URL": self.url + PDF_PATH,
+            "IUCN_API_URL": self.url + IUCN_PREFIX,
+            "IUCN_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": self.url + OPENAI_PREFIX,
+            "OPENAI_API_KEY": "benchmark",
+            "BATCH_BASE_URL": self.url + OPENAI_PREFIX,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls = {}
+
+    def _count(self, endpoint: str):
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    def _rate_limited(self, service: ServiceConfig) -> bool:
+        if not service.rpm:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._llm_window = [t for t in self._llm_window if now - t < 60]
+            if len(self._llm_window) >= service.rpm:
+                return True
+            self._llm_window.append(now)
+        return False
+
+    # responses
+
+    def search(self, query: str, page_size: int, result_type: str = "idlist") -> dict:
+        n = min(page_size, self.config.papers_per_query)
+        # papers for the same species overlap between traits, as they do in real searches
+        species = query.split(" AND ")[0].removeprefix("wild ")
+        ids = [int(_unit(species, i) * 9_000_000) + 1_000_000 for i in range(n // 2)]
+        ids += [int(_unit(query, i) * 9_000_000) + 1_000_000 for i in range(n - len(ids))]
+        results = [{"id": str(i), "source": "PMC", "pmcid": f"PMC{i}"} for i in ids]
+        if result_type == "core":
+            for result in results:
+                result.update(self.paper_metadata(result["pmcid"], species))
+        return {"hitCount": int(_unit(query, "hits") * 500) + n, "resultList": {"result": results}}
+
+    def paper_metadata(self, pmcid: str, species: str) -> dict:
+        """Title, abstract and flags of a resultType=core record; some papers never name the species."""
+        subject = species if _unit(pmcid, "mention") < self.config.species_mention_rate else "sympatric rodents"
+        return {
+            "title": f"Morphometrics and ecology of {subject}",
+            "abstractText": f"We measured body mass and brain mass of {subject}. {FILLER}",
+            "citedByCount": int(_unit(pmcid, "cited") * 200),
+            "isOpenAccess": "Y" if _unit(pmcid, "xml") < self.config.xml_fraction else "N",
+            "inEPMC": "Y",
+            "hasPDF": "Y" if _unit(pmcid, "pdf") < self.config.pdf_fraction else "N",
+        }
+
+    def paper_lines(self, pmcid: str) -> list:
+        value = f"{10 + _unit(pmcid, 'value') * 90:.1f}"
+        return [f"Body mass of adult specimens was {value} g (n = 12).", f"Brain mass was {float(value) / 20:.2f} g."]
+
+    def fulltext_xml(self, pmcid: str) -> bytes | None:
+        if _unit(pmcid, "xml") >= self.config.xml_fraction:
+            return None
+        paragraphs = "".join(f"<p>{FILLER}</p>" for _ in range(20))
+        facts = "".join(f"<p>{line}</p>" for line in self.paper_lines(pmcid))
+        return (f'<?xml version="1.0"?><article><front><article-meta><title-group><article-title>Study {pmcid}'
+                f'</article-title></title-group><abstract><p>{FILLER}</p></abstract></article-meta></front>'
+                f'<body><sec><title>Methods</title>{paragraphs}</sec><sec><title>Results</title>{facts}</sec></body>'
+                f'<back><ref-list><ref><mixed-citation>Reference list</mixed-citation></ref></ref-list></back></article>'
+                ).encode("utf-8")
+
+    def pdf(self, pmcid: str) -> bytes | None:
+        if _unit(pmcid, "pdf") >= self.config.pdf_fraction:
+            return None
+        if self._fixtures:
+            return self._fixtures[int(_unit(pmcid, "fixture") * len(self._fixtures))]
+        pages = [[FILLER[i:i + 90] for i in range(0, len(FILLER), 90)] * 4 for _ in range(self.config.pdf_pages - 1)]
+        return synthetic_pdf(pages + [self.paper_lines(pmcid)])
+
+    def iucn_taxon(self, genus: str, species: str) -> dict | None:
+        name = f"{genus} {species}"
+        if _unit(name, "iucn") >= self.config.iucn_fraction:
+            return None
+        return {
+            "taxon": {"scientific_name": name, "synonyms": [{"genus_name": f"Old{genus.lower()}", "species_name": species}]},
+            "assessments": [{"assessment_id": int(_unit(name, "aid") * 1e8), "latest": True}],
+        }
+
+    def iucn_assessment(self, assessment_id: str) -> dict:
+        return {
+            "assessment_id": int(assessment_id),
+            "red_list_category": {"code": "LC", "description": {"en": "Least Concern"}},
+            "population_trend": {"code": "0", "description": {"en": "Stable"}},
+            "habitats": [{"code": "1.6", "description": {"en": "Forest - Subtropical/Tropical Moist Lowland"}}],
+            "systems": [{"code": "0", "description": {"en": "Terrestrial"}}],
+            "documentation": {"habitats": "<p>Found in lowland forest.</p>", "population": "<p>Common.</p>"},
+            "references": [{"citation": f"Author {i} (2001). A long citation that the pruner should drop."} for i in range(200)],
+            "locations": [{"code": f"L{i}", "description": {"en": f"Location {i}"}} for i in range(100)],
+        }
+
+    def chat(self, body: dict) -> dict:
+        prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+        example = re.search(r"one key per (?:trait name|PMCID):\s*(\{.*?\})\s*$", prompt, re.M | re.S)
+        if example:
+            traits = list(json.loads(example.group(1)))
+            content = json.dumps({t: self._answer(prompt, t) for t in traits})
+        else:
+            formats = re.findall(r"^\s*(.+?): \[", prompt, re.M)
+            trait = formats[-1].strip() if formats else "value"
+            content = f"{trait}: {self._answer(prompt, trait)}"
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4 + 1
+        return {
+            "id": "chatcmpl-benchmark", "object": "chat.completion", "created": 0, "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def upload_file(self, content: bytes, filename: str, purpose: str) -> dict:
+        with self._lock:
+            file_id = f"file-{len(self._files) + 1}"
+            self._files[file_id] = content
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"}
+
+    def file_content(self, file_id: str) -> bytes | None:
+        with self._lock:
+            return self._files.get(file_id)
+
+    def create_batch(self, request: dict) -> dict | None:
+        """Start a batch over an uploaded JSONL file; it completes after batch_seconds."""
+        lines = (self.file_content(request.get("input_file_id", "")) or b"").decode("utf-8").splitlines()
+        if not lines:
+            return None
+        with self._lock:
+            batch_id = f"batch_{len(self._batches) + 1}"
+            batch = self._batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": request.get("endpoint"), "errors": None,
+                "input_file_id": request["input_file_id"], "completion_window": request.get("completion_window"),
+                "status": "in_progress", "output_file_id": None, "error_file_id": None, "created_at": int(time.time()),
+                "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+            }
+        threading.Timer(self.config.batch_seconds, self._complete_batch, (batch_id, lines)).start()
+        return dict(batch)
+
+    def _complete_batch(self, batch_id: str, lines: list):
+        output = []
+        for line in filter(None, lines):
+            request = json.loads(line)
+            self._count("llm_batch_requests")
+            output.append(json.dumps({
+                "id": f"batch_req_{len(output)}", "custom_id": request["custom_id"], "error": None,
+                "response": {"status_code": 200, "request_id": "", "body": self.chat(request["body"])},
+            }))
+        content = ("\n".join(output) + "\n").encode("utf-8")
+        with self._lock:
+            batch = self._batches[batch_id]
+            if batch["status"] != "in_progress":  # cancelled meanwhile
+                return
+        output_file = self.upload_file(content, f"{batch_id}_output.jsonl", "batch_output")
+        with self._lock:
+            batch.update(status="completed", output_file_id=output_file["id"], completed_at=int(time.time()),
+                         request_counts={"total": len(output), "completed": len(output), "failed": 0})
+
+    def get_batch(self, batch_id: str, cancel: bool = False) -> dict | None:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch and cancel and batch["status"] == "in_progress":
+                batch["status"] = "cancelled"
+            return dict(batch) if batch else None
+
+    def _answer(self, prompt: str, trait: str) -> str:
+        if "values found from different papers" in prompt:  # consensus: echo the first answer
+            first = re.search(r"^- (.+)$", prompt, re.M)
+            return first.group(1) if first else "N/A"
+        rate = self.config.abstract_answer_rate if "Abstracts:" in prompt else self.config.answer_rate
+        # keyed on the paper's own fact line when present, so triage and extraction agree about a paper
+        fact = PAPER_FACT_RE.search(prompt)
+        seed = fact.group(0) if fact else prompt[-4000:]
+        if "excerpt of a research paper report" in prompt:  # triage
+            return "yes" if _unit(seed, trait) < rate else "no"
+        if _unit(seed, trait) >= rate:
+            return "N/A"
+        return f"{10 + _unit(seed, trait, 'v') * 90:.1f} g"
+
+    def _handler_class(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b"", content_type: str = "application/json", headers: dict = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, data, status: int = 200, headers: dict = None):
+                self._send(status, json.dumps(data).encode("utf-8"), headers=headers)
+
+            def _delay(self, service: ServiceConfig) -> bool:
+                """Sleep for the service latency; False if this request should fail with 503."""
+                if service.latency:
+                    time.sleep(random.expovariate(1 / service.latency))
+                if service.error_rate and random.random() < service.error_rate:
+                    self._send(503, b'{"error": "unavailable"}')
+                    return False
+                return True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                config = services.config
+                if url.path == f"{EUROPEPMC_PREFIX}/search":
+                    services._count("europepmc_search")
+                    if self._delay(config.europepmc):
+                        self._json(services.search(query.get("query", ""), int(query.get("pageSize", 25)),
+                                                   query.get("resultType", "idlist")))
+                elif url.path.startswith(EUROPEPMC_PREFIX) and url.path.endswith("/fullTextXML"):
+                    services._count("europepmc_xml")
+                    if self._delay(config.europepmc):
+                        xml = services.fulltext_xml(url.path.split("/")[-2])
+                        self._send(200, xml, "application/xml") if xml else self._send(404, b"")
+                elif url.path == PDF_PATH:
+                    services._count("europepmc_pdf")
+                    if self._delay(config.europepmc):
+                        pdf = services.pdf(query.get("accid", ""))
+                        self._send(200, pdf, "application/pdf") if pdf else self._send(200, b"<html></html>", "text/html")
+                elif url.path == f"{IUCN_PREFIX}/taxa/scientific_name":
+                    services._count("iucn_taxa")
+                    if self._delay(config.iucn):
+                        taxon = services.iucn_taxon(query.get("genus_name", ""), query.get("species_name", ""))
+                        self._json(taxon) if taxon else self._send(404, b"{}")
+                elif url.path.startswith(f"{IUCN_PREFIX}/assessment/"):
+                    services._count("iucn_assessment")
+                    if self._delay(config.iucn):
+                        self._json(services.iucn_assessment(url.path.rsplit("/", 1)[1]))
+                elif url.path.startswith(f"{OPENAI_PREFIX}/files/") and url.path.endswith("/content"):
+                    services._count("llm_batch_files")
+                    content = services.file_content(url.path.split("/")[-2])
+                    self._send(200, content, "application/jsonl") if content is not None else self._send(404, b"{}")
+                elif url.path.startswith(f"{OPENAI_PREFIX}/batches/"):
+                    services._count("llm_batch_polls")
+                    batch = services.get_batch(url.path.rsplit("/", 1)[1])
+                    self._json(batch) if batch else self._send(404, b"{}")
+                else:
+                    self._send(404, b"{}")
+
+            def _upload(self, raw: bytes):
+                """multipart/form-data upload of a batch input file (the OpenAI client's files.create)."""
+                boundary = self.headers.get("Content-Type", "").partition("boundary=")[2].strip('"').encode()
+                fields = {}
+                for part in raw.split(b"--" + boundary)[1:-1]:
+                    head, _, value = part.strip(b"\r\n").partition(b"\r\n\r\n")
+                    name = re.search(rb'name="([^"]*)"', head)
+                    filename = re.search(rb'filename="([^"]*)"', head)
+                    if name:
+                        fields[name.group(1).decode()] = (value, filename.group(1).decode() if filename else None)
+                content, filename = fields.get("file", (b"", None))
+                purpose = fields.get("purpose", (b"batch", None))[0].decode()
+                services._count("llm_batch_files")
+                self._json(services.upload_file(content, filename or "input.jsonl", purpose))
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                path = urlparse(self.path).path
+                if path == f"{OPENAI_PREFIX}/files":
+                    return self._upload(raw)
+                body = json.loads(raw or b"{}")
+                if path == f"{OPENAI_PREFIX}/batches":
+                    services._count("llm_batches")
+                    batch = services.create_batch(body)
+                    return self._json(batch) if batch else self._json({"error": {"message": "empty or unknown input file"}}, 400)
+                if path.startswith(f"{OPENAI_PREFIX}/batches/") and path.endswith("/cancel"):
+                    batch = services.get_batch(path.split("/")[-2], cancel=True)
+                    return self._json(batch) if batch else self._send(404, b"{}")
+                if path != f"{OPENAI_PREFIX}/chat/completions":
+                    return self._send(404, b"{}")
+                services._count("llm_chat")
+                llm = services.config.llm
+                if services._rate_limited(llm):
+                    return self._json({"error": {"message": "Rate limit reached", "type": "requests"}}, 429,
+                                      {"retry-after-ms": "500", "x-ratelimit-limit-requests": str(llm.rpm)})
+                if self._delay(llm):
+                    headers = {"x-ratelimit-limit-requests": str(llm.rpm)} if llm.rpm else {}
+                    self._json(services.chat(body), headers=headers)
+
+        return Handler
@@ -0,0 +1,172 @@
+"""End-to-end throughput benchmark of process_species_traits against local mock services.
+
+Runs each synthetic workload in a fresh subprocess with cold caches, then reports pairs per
+minute, peak RSS and API calls per pair. No network access is needed, apart from tiktoken's
+cl100k_base file, which must already be in its cache (TIKTOKEN_CACHE_DIR) on offline machines.
+
+    python benchmarks/run_benchmarks.py --sizes 100,1000,10000
+    python benchmarks/run_benchmarks.py --sizes 100 --llm-latency 1.0 --llm-rpm 3000 --error-rate 0.02
+    python benchmarks/run_benchmarks.py --sizes 100 --batch
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_services import MockServices, MockConfig, ServiceConfig
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+DEFAULT_TRAITS = {
+    "Body Mass": "Return only a single numeric value measured in grams, but omit the unit in the output.",
+    "Brain Mass": "Return only a single numeric value measured in grams, but omit the unit in the output.",
+}
+EXTRACTION_STAGES = ("abstract_extract", "llm_extract")
+
+
+def run_child(args):
+    """Worker process: run the pipeline over a synthetic species list and write measurements as JSON."""
+    sys.path.insert(0, SCRIPTS_DIR)
+    from pubmed_query import process_species_traits
+
+    species = [f"Benchgenus species{i}" for i in range(args.size)]
+    traits = json.loads(args.traits_json)
+    output = os.path.join(args.workdir, "benchmark.csv")
+    start = time.monotonic()
+    process_species_traits(species, list(traits), output, traits, resume=False)
+    seconds = time.monotonic() - start
+
+    with open(os.path.join(args.workdir, "benchmark.metrics.json"), encoding="utf-8") as f:
+        report = json.load(f)
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    result = {
+        "seconds": seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "peak_rss_children_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+        # extraction replies the pipeline got from the LLM or the response cache; 0 means every pair failed
+        "extraction_calls": sum(report["stages"].get(stage, {}).get("llm_calls", 0) for stage in EXTRACTION_STAGES),
+        "llm_cache_hits": report.get("llm_cache", {}).get("hits", 0),
+        "prompt_tokens": report["prompt_tokens"],
+        "completion_tokens": report["completion_tokens"],
+        "stages": report["stages"],
+    }
+    with open(args.result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def run_workload(services: MockServices, size: int, traits: dict, extra_env: dict, keep_logs: bool) -> dict:
+    services.reset_counts()
+    with tempfile.TemporaryDirectory(prefix="trait_bench_") as workdir:
+        env = {
+            **os.environ, **services.env(),
+            # the client-side limiter follows the mock's limits rather than the defaults for OpenAI tiers
+            "LLM_RPM": str(services.config.llm.rpm), "LLM_TPM": "0",
+            **extra_env,
+            "PAPER_CACHE_DIR": os.path.join(workdir, "papers"),
+            "IUCN_CACHE_DIR": os.path.join(workdir, "iucn"),
+            "LLM_CACHE_PATH": os.path.join(workdir, "llm.sqlite"),
+            "SEARCH_CACHE_PATH": os.path.join(workdir, "searches.sqlite"),
+            "METRICS": "1",
+        }
+        result_path = os.path.join(workdir, "result.json")
+        log_path = os.path.join(workdir, "run.log")
+        with open(log_path, "w") as log:
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--size", str(size), "--workdir", workdir,
+                 "--result-path", result_path, "--traits-json", json.dumps(traits)],
+                env=env, cwd=SCRIPTS_DIR, stdout=log, stderr=subprocess.STDOUT,
+            )
+        if keep_logs or proc.returncode != 0:
+            kept = os.path.join(tempfile.gettempdir(), f"trait_bench_{size}.log")
+            os.replace(log_path, kept)
+            print(f"  log: {kept}")
+        if proc.returncode != 0:
+            raise RuntimeError(f"benchmark run for {size} species failed with exit code {proc.returncode}")
+        with open(result_path, encoding="utf-8") as f:
+            result = json.load(f)
+
+    pairs = size * len(traits)
+    calls = dict(services.calls)
+    return {
+        "species": size,
+        "pairs": pairs,
+        **result,
+        "pairs_per_minute": pairs / result["seconds"] * 60,
+        "api_calls": calls,
+        "api_calls_per_pair": {name: count / pairs for name, count in sorted(calls.items())},
+        "total_api_calls_per_pair": sum(calls.values()) / pairs,
+        "valid": bool(result["extraction_calls"] or result["llm_cache_hits"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma-separated species counts")
+    parser.add_argument("--traits-file", help="trait description file (default: Body Mass and Brain Mass)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="mean LLM response time in seconds")
+    parser.add_argument("--llm-rpm", type=int, default=0, help="LLM requests per minute before 429 (0 = unlimited)")
+    parser.add_argument("--http-latency", type=float, default=0.05, help="mean Europe PMC / IUCN response time")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--xml-fraction", type=float, default=0.5, help="fraction of papers with JATS full text")
+    parser.add_argument("--batch", action="store_true", help="run in batch mode against the mock Batch API")
+    parser.add_argument("--batch-seconds", type=float, default=1.0, help="time a mock batch takes to complete")
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE setting for the run, repeatable")
+    parser.add_argument("--report", help="write all results as JSON to this file")
+    parser.add_argument("--keep-logs", action="store_true", help="keep each run's console output")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-path", help=argparse.SUPPRESS)
+    parser.add_argument("--traits-json", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    traits = DEFAULT_TRAITS
+    if args.traits_file:
+        sys.path.insert(0, SCRIPTS_DIR)
+        from inputs import load_trait_descriptions
+        with open(args.traits_file, encoding="utf-8") as f:
+            names = [line.split(":", 1)[0].strip().lstrip("\ufeff") for line in f if ":" in line]
+        traits = load_trait_descriptions(args.traits_file, names)
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    if args.batch:
+        extra_env = {"BATCH_MODE": "1", "BATCH_POLL_SECONDS": str(min(1.0, args.batch_seconds / 4)), **extra_env}
+
+    http = ServiceConfig(latency=args.http_latency, error_rate=args.error_rate)
+    config = MockConfig(
+        europepmc=http, iucn=http, xml_fraction=args.xml_fraction,
+        llm=ServiceConfig(latency=args.llm_latency, error_rate=args.error_rate, rpm=args.llm_rpm),
+        batch_seconds=args.batch_seconds,
+    )
+    services = MockServices(config).start()
+    results = []
+    try:
+        print(f"{'species':>8} {'pairs':>7} {'seconds':>9} {'pairs/min':>10} {'peak RSS MB':>12} {'calls/pair':>11}")
+        for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+            r = run_workload(services, size, traits, extra_env, args.keep_logs)
+            results.append(r)
+            print(f"{r['species']:>8} {r['pairs']:>7} {r['seconds']:>9.1f} {r['pairs_per_minute']:>10.1f} "
+                  f"{r['peak_rss_mb']:>12.0f} {r['total_api_calls_per_pair']:>11.2f}")
+            print("         " + ", ".join(f"{k} {v:.2f}" for k, v in r["api_calls_per_pair"].items()))
+            if not r["valid"]:
+                print("         INVALID: no LLM extraction succeeded (run again with --keep-logs to see why)")
+    finally:
+        services.stop()
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"Report written to {args.report}")
+    if not all(r["valid"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+import os
+import json
+import asyncio
+import tempfile
+import time
+from openai import OpenAI
+from dotenv import load_dotenv
+from utils import (
+    get_iucn_assessment, prune_iucn_assessment, fetch_paper_async, parse_llm_output, parse_llm_json_output, EMPTY_ANSWERS
+)
+from llm_client import LLM_MODEL, TRIAGE_MODEL, CONSENSUS_MODEL, response_cache
+from llm_cache import ReplayMiss
+from pdf_pool import pdf_parse_pool
+from result_sink import ResultSink
+from job_store import JobStore
+from run_control import run_control
+from metrics import metrics, METRICS
+from search_cache import search_cache
+from consensus import local_consensus
+from pubmed_query import (
+    build_extraction_messages, build_consensus_messages, build_iucn_messages, build_abstract_messages, build_triage_messages,
+    paper_excerpt, triage_excerpt, triage_positive, find_candidates, candidate_abstracts, run_paths, plan_incremental, _log_paper,
+    ABSTRACT_TIER, LOCAL_CONSENSUS, TRIAGE_MAX_TOKENS
+)
+
+load_dotenv()
+
+# configuration
+BATCH_BASE_URL = os.getenv("BATCH_BASE_URL")  # defaults to OPENAI_BASE_URL / api.openai.com
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "60"))
+BATCH_PAPERS_PER_WAVE = int(os.getenv("BATCH_PAPERS_PER_WAVE", "5"))  # papers per pair sent in each extraction wave
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_MAX_REQUESTS = 50000  # Batch API limits per input file
+BATCH_MAX_BYTES = 180 * 1024 * 1024
+FETCH_CONCURRENCY = 16
+FETCH_CHUNK_PAIRS = 64  # pairs whose papers are held in memory at once while building a wave
+
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class ChatBatch:
+    """Collects chat requests into Batch API JSONL files, submits them, and waits for the replies.
+
+    Requests already in the LLM response cache are answered locally and never submitted, and
+    replies are written back to the cache. Input is split into several batches when it exceeds
+    the per-file request or size limits.
+    """
+
+    def __init__(self, label: str, model: str = LLM_MODEL, max_completion_tokens: int = 2000, client: OpenAI = None,
+                 stage: str = "llm_extract"):
+        self.label = label
+        self.stage = stage  # metrics stage the batch's time and token usage are reported under
+        self.model = model
+        self.max_completion_tokens = max_completion_tokens
+        self.client = client or OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=BATCH_BASE_URL)
+        self.replies = {}
+        self._cache_keys = {}
+        self._tmp_dir = tempfile.mkdtemp(prefix="trait_batch_")
+        self._files = []
+        self._file = None
+        self._lines = 0
+        self._bytes = 0
+
+    def add(self, custom_id: str, messages: list):
+        key = response_cache.key(self.model, str(self.client.base_url), messages,
+                                 max_completion_tokens=self.max_completion_tokens)
+        try:
+            cached = response_cache.get(key)
+        except ReplayMiss:
+            self.replies[custom_id] = None
+            return
+        if cached is not None:
+            self.replies[custom_id] = cached
+            return
+
+        line = json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": self.model, "messages": messages, "max_completion_tokens": self.max_completion_tokens},
+        }) + "\n"
+        size = len(line.encode("utf-8"))
+        if self._file is None or self._lines >= BATCH_MAX_REQUESTS or self._bytes + size > BATCH_MAX_BYTES:
+            self._open_next_file()
+        self._file.write(line)
+        self._lines += 1
+        self._bytes += size
+        self._cache_keys[custom_id] = key
+
+    def _open_next_file(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self._tmp_dir, f"{self.label}_{len(self._files)}.jsonl")
+        self._files.append(path)
+        self._file = open(path, "w", encoding="utf-8")
+        self._lines = 0
+        self._bytes = 0
+
+    def _submit(self, path: str) -> str:
+        with open(path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window=BATCH_COMPLETION_WINDOW
+        )
+        return batch.id
+
+    def _read_output(self, file_id: str):
+        for line in self.client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record.get("custom_id")
+            body = (record.get("response") or {}).get("body") or {}
+            try:
+                content = (body["choices"][0]["message"]["content"] or "").strip()
+            except (KeyError, IndexError, TypeError):
+                error = record.get("error") or body.get("error")
+                print(f"      Batch request {custom_id} failed: {error}")
+                continue
+            self.replies[custom_id] = content
+            usage = body.get("usage") or {}
+            metrics.add_tokens(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+            if custom_id in self._cache_keys:
+                response_cache.put(self._cache_keys[custom_id], self.model, content)
+
+    async def run(self) -> dict:
+        """Submit everything added so far and wait; returns {custom_id: reply or None}."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            with metrics.stage(self.stage):
+                await self._submit_and_wait()
+        finally:
+            for path in self._files:
+                os.remove(path)
+            os.rmdir(self._tmp_dir)
+        for custom_id in self._cache_keys:
+            self.replies.setdefault(custom_id, None)
+        return self.replies
+
+    async def _submit_and_wait(self):
+        if not self._cache_keys:
+            return
+        batch_ids = []
+        try:
+            for path in self._files:
+                await run_control.checkpoint()
+                batch_ids.append(await asyncio.to_thread(self._submit, path))
+            print(f"  Submitted {len(self._cache_keys)} {self.label} requests in {len(batch_ids)} batch(es)"
+                  f" ({len(self.replies)} answered from cache)")
+            await self._wait(batch_ids)
+        except BaseException:
+            if run_control.cancelled:
+                self._cancel(batch_ids)
+            raise
+
+    def _cancel(self, batch_ids: list):
+        """Cancel submitted batches so a cancelled run stops spending; finished requests are still billed."""
+        for batch_id in batch_ids:
+            try:
+                self.client.batches.cancel(batch_id)
+                print(f"  Cancelled batch {batch_id}")
+            except Exception as e:
+                print(f"  Could not cancel batch {batch_id}: {e}")
+
+    async def _wait(self, batch_ids: list):
+        pending = set(batch_ids)
+        start = time.time()
+        while pending:
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+            for batch_id in list(pending):
+                batch = await asyncio.to_thread(self.client.batches.retrieve, batch_id)
+                if batch.status not in FINAL_STATUSES:
+                    continue
+                pending.discard(batch_id)
+                if batch.status != "completed":
+                    print(f"  Batch {batch_id} ended with status {batch.status}")
+                # expired batches still return the requests that finished
+                for file_id in (batch.output_file_id, batch.error_file_id):
+                    if file_id:
+                        await asyncio.to_thread(self._read_output, file_id)
+            if pending:
+                print(f"  Waiting on {len(pending)} {self.label} batch(es), {int(time.time() - start)}s elapsed")
+
+
+async def _bounded_gather(func, args: list, limit: int = FETCH_CONCURRENCY):
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(arg):
+        async with semaphore:
+            return await func(arg)
+
+    return await asyncio.gather(*(run(a) for a in args))
+
+
+async def _add_paper_requests(batch: ChatBatch, pairs: list, papers: dict, trait_descriptions: dict, prefix: str,
+                              excerpt, build_messages, skip=()):
+    """Add one request per fetched paper of each pair, as "<prefix><pair index>-<pmcid>"; papers are fetched a chunk of pairs at a time."""
+    for start in range(0, len(pairs), FETCH_CHUNK_PAIRS):
+        chunk = pairs[start:start + FETCH_CHUNK_PAIRS]
+        unique = list(dict.fromkeys(pmcid for n, p in enumerate(chunk, start) for pmcid in papers[p] if f"{n}-{pmcid}" not in skip))
+        texts = dict(zip(unique, await _bounded_gather(fetch_paper_async, unique)))
+        for n, p in enumerate(chunk, start):
+            _, species, trait = p
+            trait_desc = trait_descriptions.get(trait, "")
+            for pmcid in papers[p]:
+                if texts.get(pmcid) and f"{n}-{pmcid}" not in skip:
+                    text = await asyncio.to_thread(excerpt, texts[pmcid], species, [trait], {trait: trait_desc})
+                    batch.add(f"{prefix}{n}-{pmcid}", build_messages(species, trait, text, trait_desc))
+
+
+async def _run_batch_pipeline(species_list: list, traits_list: list, trait_descriptions: dict, sink: ResultSink,
+                              all_papers_log: str, successful_papers_log: str, progress_callback=None, result_callback=None,
+                              kept: dict = None):
+    pairs = [(idx, species, trait) for idx, species in enumerate(species_list) for trait in traits_list]
+    total_steps = len(pairs)
+    finished = set()
+    kept = kept or {}
+
+    def finish(pair, value):
+        idx, _, trait = pair
+        sink.record(idx, {trait: value})
+        if result_callback:
+            result_callback(idx, {trait: value})
+        finished.add(pair)
+        if progress_callback:
+            progress_callback(len(finished), total_steps)
+
+    # cells kept by an incremental run
+    for pair in pairs:
+        if (pair[1], pair[2]) in kept:
+            finish(pair, kept[(pair[1], pair[2])])
+    open_traits = {}
+    for _, species, trait in (p for p in pairs if p not in finished):
+        open_traits.setdefault(species, []).append(trait)
+
+    # WAVE 0: IUCN
+    species_names = list(open_traits)
+    assessments = dict(zip(species_names, await _bounded_gather(
+        lambda s: asyncio.to_thread(get_iucn_assessment, *(s.split(" ", 1) if " " in s else (s, ""))), species_names
+    )))
+    # one request per species for all traits, over the pruned assessment
+    batch = ChatBatch("iucn", stage="iucn")
+    for n, species in enumerate(species_names):
+        if assessments.get(species):
+            batch.add(f"iucn-{n}", build_iucn_messages(species, open_traits[species], prune_iucn_assessment(assessments[species]),
+                                                       trait_descriptions))
+    replies = await batch.run()
+    iucn_values = {
+        species: parse_llm_json_output(replies.get(f"iucn-{n}") or "", open_traits[species])
+        for n, species in enumerate(species_names)
+    }
+    for pair in pairs:
+        if pair in finished:
+            continue
+        value = iucn_values[pair[1]].get(pair[2], "N/A")
+        if value not in EMPTY_ANSWERS:
+            finish(pair, value)
+    await asyncio.to_thread(sink.checkpoint)
+
+    # literature search for the rest
+    open_pairs = [p for p in pairs if p not in finished]
+    searches = await _bounded_gather(
+        lambda p: asyncio.to_thread(find_candidates, p[1], p[2], trait_descriptions.get(p[2], ""), 20), open_pairs
+    )
+    candidates = {pair: pmcids[:20] for pair, pmcids in zip(open_pairs, searches)}
+    for pair, pmcids in candidates.items():
+        if not pmcids:
+            print(f"    No papers found for {pair[1]} {pair[2]}")
+            finish(pair, "")
+    cursor = {pair: 0 for pair in candidates}
+    answers = {pair: [] for pair in candidates}
+
+    # ABSTRACT WAVE: one request per pair over all of its candidates' abstracts
+    if ABSTRACT_TIER:
+        open_pairs = [p for p in candidates if p not in finished]
+        abstracts = dict(zip(open_pairs, await _bounded_gather(
+            lambda p: asyncio.to_thread(candidate_abstracts, p[1], p[2], candidates[p]), open_pairs
+        )))
+        batch = ChatBatch("abstracts", stage="abstract_extract")
+        for n, p in enumerate(open_pairs):
+            if abstracts[p]:
+                batch.add(f"a{n}", build_abstract_messages(p[1], p[2], abstracts[p], trait_descriptions.get(p[2], "")))
+        replies = await batch.run()
+        for n, p in enumerate(open_pairs):
+            reply = replies.get(f"a{n}")
+            if reply is None:
+                continue
+            _, species, trait = p
+            values = parse_llm_json_output(reply, list(abstracts[p]))
+            answered = [pmcid for pmcid in candidates[p] if values.get(pmcid) not in EMPTY_ANSWERS][:3]
+            for pmcid in answered:
+                _log_paper(all_papers_log, species, trait, pmcid)
+                _log_paper(successful_papers_log, species, trait, pmcid)
+                answers[p].append(values[pmcid])
+            # papers whose abstract answered are not read again in full
+            candidates[p] = [pmcid for pmcid in candidates[p] if pmcid not in answered]
+
+    # EXTRACTION WAVES: the next BATCH_PAPERS_PER_WAVE papers of every pair still short of 3 answers
+    wave = 1
+    while True:
+        needy = [p for p in candidates if p not in finished and len(answers[p]) < 3 and cursor[p] < len(candidates[p])]
+        if not needy:
+            break
+        print(f"\nExtraction wave {wave}: {len(needy)} pairs")
+        wave_papers = {p: candidates[p][cursor[p]:cursor[p] + BATCH_PAPERS_PER_WAVE] for p in needy}
+        for p in needy:
+            cursor[p] += len(wave_papers[p])
+
+        # with TRIAGE_MODEL, a cheap batch first decides which papers the extraction batch reads;
+        # the papers are fetched again for it (from the paper cache) rather than held across the wait
+        negative = set()
+        if TRIAGE_MODEL:
+            batch = ChatBatch(f"triage{wave}", model=TRIAGE_MODEL, max_completion_tokens=TRIAGE_MAX_TOKENS, stage="llm_triage")
+            await _add_paper_requests(batch, needy, wave_papers, trait_descriptions, "t", triage_excerpt,
+                                      lambda species, trait, excerpt, desc: build_triage_messages(species, [trait], excerpt, {trait: desc}))
+            replies = await batch.run()
+            for custom_id, reply in replies.items():
+                trait = needy[int(custom_id[1:].split("-", 1)[0])][2]
+                if reply is not None and not triage_positive(parse_llm_json_output(reply, [trait])[trait]):
+                    negative.add(custom_id[1:])
+            print(f"  Triage: {len(negative)} of {len(replies)} papers skipped")
+
+        batch = ChatBatch(f"extract{wave}")
+        await _add_paper_requests(batch, needy, wave_papers, trait_descriptions, "x", paper_excerpt, build_extraction_messages,
+                                  skip=negative)
+        replies = await batch.run()
+
+        # consume in search-rank order so the first 3 valid answers match the interactive pipeline
+        for n, p in enumerate(needy):
+            _, species, trait = p
+            for pmcid in wave_papers[p]:
+                if len(answers[p]) >= 3:
+                    break
+                if f"{n}-{pmcid}" in negative:
+                    _log_paper(all_papers_log, species, trait, pmcid)
+                    continue
+                reply = replies.get(f"x{n}-{pmcid}")
+                if reply is None:
+                    continue
+                _log_paper(all_papers_log, species, trait, pmcid)
+                value = parse_llm_output(reply, trait)
+                if value not in EMPTY_ANSWERS:
+                    _log_paper(successful_papers_log, species, trait, pmcid)
+                    answers[p].append(value)
+        wave += 1
+
+    # CONSENSUS WAVE (numeric answers are combined locally)
+    if LOCAL_CONSENSUS:
+        for p in candidates:
+            if p not in finished and answers[p]:
+                value = local_consensus(answers[p])
+                if value is not None:
+                    finish(p, value)
+    batch = ChatBatch("consensus", model=CONSENSUS_MODEL, stage="consensus")
+    for n, p in enumerate(candidates):
+        if p not in finished and answers[p]:
+            batch.add(f"c{n}", build_consensus_messages(p[1], p[2], answers[p]))
+    replies = await batch.run()
+    for n, p in enumerate(candidates):
+        if p not in finished:
+            reply = replies.get(f"c{n}")
+            finish(p, parse_llm_output(reply, p[2]) if reply else "")
+    await asyncio.to_thread(sink.checkpoint)
+
+
+def process_species_traits_batch(species_list: list, traits_list: list, output_file: str, trait_descriptions: dict = None,
+                                 progress_callback=None, log_prefix: str = "", result_callback=None,
+                                 incremental: bool = False, refresh: bool = False, input_values: dict = None):
+    """Batch API variant of process_species_traits for large, latency-insensitive jobs.
+
+    Runs one IUCN wave, an abstract wave when ABSTRACT_TIER is on, extraction waves of
+    BATCH_PAPERS_PER_WAVE papers per unresolved pair until each pair has 3 answers or runs out
+    of candidates, then one consensus wave. Batch runs do not resume, but the job store records
+    when they finished and with which trait descriptions, for later incremental runs.
+    """
+    output_path, all_papers_log, successful_papers_log = run_paths(output_file, log_prefix)
+    if not incremental:
+        open(all_papers_log, "w").close()
+        open(successful_papers_log, "w").close()
+
+    start_time = time.time()
+    stem = os.path.splitext(output_path)[0]
+    metrics.start_run(f"{stem}.metrics.csv" if METRICS else None)
+    sink = ResultSink(output_path, species_list, traits_list)
+    store = JobStore(f"{stem}.jobs.sqlite")
+    store.begin(resume=False, keep_finished=incremental)
+    kept = None
+    if incremental:
+        kept = plan_incremental(store, species_list, traits_list, trait_descriptions or {}, input_values, output_path, refresh)
+    store.save_trait_descriptions(trait_descriptions or {})
+    try:
+        asyncio.run(run_control.run(_run_batch_pipeline(
+            species_list, traits_list, trait_descriptions or {}, sink,
+            all_papers_log, successful_papers_log, progress_callback, result_callback, kept
+        )))
+        store.finish()
+    finally:
+        sink.checkpoint()
+        sink.close()
+        store.close()
+        pdf_parse_pool.shutdown()
+
+    total_time = time.time() - start_time
+    total_pairs = len(species_list) * len(traits_list)
+    report = metrics.finish_run(f"{stem}.metrics.json" if METRICS else None, extra={
+        "pairs": total_pairs,
+        "pairs_per_minute": round(total_pairs / total_time * 60, 2) if total_time else 0.0,
+        "llm_cache": response_cache.stats(),
+        "search_cache": search_cache.stats(),
+    })
+    print(f"\nResults written to {output_file}")
+    print(f"LLM tokens: {report['prompt_tokens']} prompt, {report['completion_tokens']} completion")
+    return output_path
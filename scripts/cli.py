@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import glob
+import socket
+import hashlib
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+import pandas as pd
+from inputs import load_species_table, load_trait_descriptions, read_table, filled_cells
+from pubmed_query import process_species_traits, sanity_check, RESULTS_DIR
+from metrics import metrics
+
+# settings recorded in provenance files (API keys are never recorded)
+CONFIG_KEYS = (
+    "LLM_MODEL", "OPENAI_BASE_URL", "MULTI_TRAIT", "BATCH_MODE", "PAPER_SOURCE", "PAPER_WORKERS", "PAIR_CONCURRENCY",
+    "RETRIEVAL_TOKEN_BUDGET", "RETRIEVAL_TOP_K", "LLM_CACHE_MODE", "SEARCH_CACHE_DAYS", "IUCN_CACHE_DAYS",
+    "PAPER_SCREENING", "ABSTRACT_TIER", "LOCAL_CONSENSUS", "PDF_MAX_MB", "PDF_PARSE_MAX_CHARS", "INCREMENTAL",
+    "REFRESH_NEW_PAPERS", "LLM_ENDPOINTS", "TRIAGE_MODEL", "TRIAGE_TOKEN_BUDGET", "CONSENSUS_MODEL",
+)
+
+
+def parse_shard(spec: str) -> tuple:
+    """(i, n) from "i/n", with shards numbered 1..n."""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like 3/20, got {spec!r}")
+    if not 1 <= i <= n:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {n}, got {i}")
+    return i, n
+
+
+def shard_species(species_list: list, shard: tuple | None) -> list:
+    """Species of one shard: every n-th species starting at position i-1, so shards get similar mixes."""
+    if not shard:
+        return species_list
+    i, n = shard
+    return species_list[i - 1::n]
+
+
+def shard_stem(output_file: str, shard: tuple | None) -> str:
+    stem = os.path.splitext(output_file)[0]
+    if not shard:
+        return stem
+    i, n = shard
+    return f"{stem}.shard-{i:0{len(str(n))}d}-of-{n}"
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _write_json(path: str, data: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _write_table(table: pd.DataFrame, path: str):
+    """Write by extension into a temporary file, then move it into place."""
+    ext = os.path.splitext(path)[1].lower()
+    tmp_path = f"{path}.tmp"
+    if ext == ".parquet":
+        table.to_parquet(tmp_path, index=False)
+    elif ext in (".arrow", ".feather"):
+        table.to_feather(tmp_path)
+    else:
+        table.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _progress(done: int, total: int):
+    if total and (done == total or done * 100 // total != (done - 1) * 100 // total):
+        print(f"Progress: {done}/{total} pairs ({done * 100 // total}%), {metrics.progress_text(done, total)}", flush=True)
+
+
+def _load_inputs(args) -> tuple:
+    species_list, traits_list = load_species_table(args.species)
+    trait_descriptions = load_trait_descriptions(args.traits, traits_list)
+    return species_list, traits_list, trait_descriptions
+
+
+def cmd_run(args):
+    species_list, traits_list, trait_descriptions = _load_inputs(args)
+    species = shard_species(species_list, args.shard)
+    stem = shard_stem(args.output, args.shard)
+    output_file = os.path.join(os.path.abspath(args.results_dir), f"{stem}{os.path.splitext(args.output)[1] or '.csv'}")
+    provenance_path = os.path.join(os.path.abspath(args.results_dir), f"{stem}.provenance.json")
+
+    provenance = {
+        "output": os.path.basename(output_file),
+        "shard": {"index": args.shard[0], "count": args.shard[1]} if args.shard else None,
+        "species_total": len(species_list),
+        "species_in_shard": len(species),
+        "traits": traits_list,
+        "species_file": {"path": os.path.abspath(args.species), "sha256": _sha256(args.species)},
+        "traits_file": {"path": os.path.abspath(args.traits), "sha256": _sha256(args.traits)},
+        "options": {"multi_trait": args.multi_trait, "batch": args.batch, "resume": not args.no_resume,
+                    "incremental": args.incremental, "refresh": args.refresh},
+        "config": {key: os.environ[key] for key in CONFIG_KEYS if key in os.environ},
+        "git_commit": _git_commit(),
+        "host": socket.gethostname(),
+        "python": platform.python_version(),
+        "argv": sys.argv,
+        "started": _now(),
+        "finished": None,
+        "status": "running",
+    }
+    os.makedirs(os.path.dirname(provenance_path), exist_ok=True)
+    _write_json(provenance_path, provenance)
+
+    print(f"Shard {stem}: {len(species)} of {len(species_list)} species, {len(traits_list)} traits")
+    try:
+        process_species_traits(
+            species, traits_list, output_file, trait_descriptions, progress_callback=_progress,
+            multi_trait=args.multi_trait or None, resume=not args.no_resume, batch=args.batch or None,
+            log_prefix=f"{stem}." if args.shard else "",
+            incremental=args.incremental or None, refresh=args.refresh or None, input_values=filled_cells(args.species),
+        )
+    except BaseException:
+        provenance.update(status="failed", finished=_now())
+        _write_json(provenance_path, provenance)
+        raise
+    provenance.update(status="finished", finished=_now())
+    _write_json(provenance_path, provenance)
+
+
+def cmd_check(args):
+    species_list, traits_list, _ = _load_inputs(args)
+    species = shard_species(species_list, args.shard)
+    stem = shard_stem("literature_availability_results", args.shard)
+    log_file = os.path.join(os.path.abspath(args.results_dir), f"{stem}.txt")
+    trait_stats, _ = sanity_check(species, traits_list, log_file=log_file)
+    for trait, stats in trait_stats.items():
+        print(f"{trait}: {stats['mean']:.1f} +- {stats['std_dev']:.1f} papers")
+    print(f"Full report written to {log_file}")
+
+
+def cmd_merge(args):
+    results_dir = os.path.abspath(args.results_dir)
+    stem = os.path.splitext(args.output)[0]
+    shards = []
+    for path in glob.glob(os.path.join(results_dir, f"{glob.escape(stem)}.shard-*-of-*.provenance.json")):
+        with open(path, encoding="utf-8") as f:
+            shards.append(json.load(f))
+    if not shards:
+        sys.exit(f"No shard provenance files for {stem} in {results_dir}")
+
+    counts = {p["shard"]["count"] for p in shards}
+    if len(counts) != 1:
+        sys.exit(f"Shards of {stem} were split different ways: {sorted(counts)}")
+    n = counts.pop()
+    by_index = {p["shard"]["index"]: p for p in shards}
+    missing = [i for i in range(1, n + 1) if i not in by_index]
+    if missing:
+        sys.exit(f"Missing shards of {n}: {missing}")
+    if len({(p["species_file"]["sha256"], p["traits_file"]["sha256"]) for p in shards}) != 1:
+        sys.exit("Shards were run on different input files")
+    unfinished = [i for i, p in sorted(by_index.items()) if p["status"] != "finished"]
+    if unfinished and not args.allow_unfinished:
+        sys.exit(f"Shards not finished: {unfinished} (use --allow-unfinished to merge anyway)")
+
+    # shard i holds input positions i-1, i-1+n, ...; interleaving restores the input order
+    tables = []
+    for i in range(1, n + 1):
+        shard_path = os.path.join(results_dir, by_index[i]["output"])
+        tables.append(read_table(shard_path) if os.path.exists(shard_path) else None)
+    if all(t is None for t in tables):
+        sys.exit(f"No shard outputs of {stem} found in {results_dir}")
+    columns = next(t.columns for t in tables if t is not None)
+    rows = []
+    for k in range(max(p["species_in_shard"] for p in shards)):
+        for i, table in enumerate(tables, 1):
+            if k < by_index[i]["species_in_shard"]:
+                if table is not None and k < len(table):
+                    rows.append(table.iloc[k].tolist())
+                else:  # unfinished shard
+                    rows.append([None] * len(columns))
+    merged = pd.DataFrame(rows, columns=columns)
+
+    output_path = os.path.join(results_dir, f"{stem}{os.path.splitext(args.output)[1] or '.csv'}")
+    _write_table(merged, output_path)
+
+    for log_name in ("all_papers.txt", "successful_papers.txt"):
+        with open(os.path.join(results_dir, f"{stem}.{log_name}"), "w", encoding="utf-8") as out:
+            for i in range(1, n + 1):
+                shard_log = os.path.join(results_dir, f"{os.path.splitext(by_index[i]['output'])[0]}.{log_name}")
+                if os.path.exists(shard_log):
+                    with open(shard_log, encoding="utf-8") as f:
+                        out.write(f.read())
+
+    _write_json(os.path.join(results_dir, f"{stem}.provenance.json"), {
+        "output": os.path.basename(output_path),
+        "merged": _now(),
+        "rows": len(merged),
+        "shards": [by_index[i] for i in range(1, n + 1)],
+    })
+    print(f"Merged {n} shards ({len(merged)} species) into {output_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run trAIt without the GUI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("--results-dir", default=RESULTS_DIR, help="directory for outputs (default: results/)")
+
+    def add_inputs(p):
+        p.add_argument("--species", required=True, help="species CSV or Excel file (first column species, other columns traits)")
+        p.add_argument("--traits", required=True, help="trait description file (trait: description per line)")
+        p.add_argument("--shard", type=parse_shard, help="process only shard i of n, e.g. 3/20 (species split round-robin)")
+        add_common(p)
+
+    run = sub.add_parser("run", help="extract traits")
+    add_inputs(run)
+    run.add_argument("--output", default="output_results.csv", help="output file name (shards add .shard-i-of-n)")
+    run.add_argument("--multi-trait", action="store_true", help="read each paper once for all traits of a species")
+    run.add_argument("--batch", action="store_true", help="send LLM calls through the Batch API")
+    run.add_argument("--no-resume", action="store_true", help="start over instead of resuming an unfinished run")
+    run.add_argument("--incremental", action="store_true",
+                     help="keep cells filled in the species file or by earlier runs; process only new or changed pairs")
+    run.add_argument("--refresh", action="store_true",
+                     help="with --incremental, also redo pairs with Europe PMC papers published since the last run")
+    run.set_defaults(func=cmd_run)
+
+    check = sub.add_parser("check", help="literature availability check")
+    add_inputs(check)
+    check.set_defaults(func=cmd_check)
+
+    merge = sub.add_parser("merge", help="combine shard outputs in input order")
+    merge.add_argument("--output", default="output_results.csv", help="output file name the shards were run with")
+    merge.add_argument("--allow-unfinished", action="store_true", help="merge even if some shards did not finish")
+    add_common(merge)
+    merge.set_defaults(func=cmd_merge)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
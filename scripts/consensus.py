@@ -0,0 +1,122 @@
+import math
+import re
+from collections import Counter
+
+# factor to a base unit, per dimension; answers are only combined within one dimension
+UNITS = {
+    "mass": {"µg": 1e-6, "ug": 1e-6, "mg": 1e-3, "g": 1.0, "kg": 1e3, "t": 1e6},
+    "length": {"µm": 1e-3, "um": 1e-3, "mm": 1.0, "cm": 10.0, "dm": 100.0, "m": 1e3, "km": 1e6},
+    "time": {"h": 1 / 24, "d": 1.0, "wk": 7.0, "mo": 365.25 / 12, "yr": 365.25},
+}
+UNIT_ALIASES = {
+    "gram": "g", "grams": "g", "gr": "g", "kilogram": "kg", "kilograms": "kg", "kgs": "kg", "milligram": "mg",
+    "milligrams": "mg", "microgram": "µg", "micrograms": "µg", "μg": "µg", "tonne": "t", "tonnes": "t",
+    "millimeter": "mm", "millimeters": "mm", "millimetre": "mm", "millimetres": "mm", "centimeter": "cm",
+    "centimeters": "cm", "centimetre": "cm", "centimetres": "cm", "meter": "m", "meters": "m", "metre": "m",
+    "metres": "m", "kilometer": "km", "kilometers": "km", "kilometre": "km", "kilometres": "km", "micrometer": "µm",
+    "micrometers": "µm", "micrometre": "µm", "micrometres": "µm", "μm": "µm",
+    "hour": "h", "hours": "h", "hr": "h", "hrs": "h", "day": "d", "days": "d", "week": "wk", "weeks": "wk",
+    "wks": "wk", "month": "mo", "months": "mo", "year": "yr", "years": "yr", "yrs": "yr", "y": "yr",
+    "Kg": "kg", "KG": "kg",
+}
+# symbols are matched case-sensitively (m is not M, mg is not Mg); longer names in any case
+CASE_INSENSITIVE_MIN_LENGTH = 3
+
+NUMBER = r"[-−]?\d{1,3}(?:,\d{3})+(?:\.\d+)?|[-−]?\d+(?:\.\d+)?|[-−]?\.\d+"
+ANSWER_RE = re.compile(
+    rf"^(?:~|≈|ca\.?|c\.|approx\.?|approximately|about|around)?\s*(?P<low>{NUMBER})"
+    rf"(?:\s*(?:-|–|—|to)\s*(?P<high>{NUMBER}))?"
+    rf"(?:\s*(?:±|\+/-|\+-)\s*(?:{NUMBER}))?"  # a spread reported by the paper; only the central value is used
+    r"\s*(?P<unit>[^\d\s(),;:=]+(?:\s+[^\d\s(),;:=]+){0,2})?\s*$",
+    re.IGNORECASE,
+)
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", "").replace("−", "-"))
+
+
+def _decimals(text: str) -> int:
+    return len(text.partition(".")[2])
+
+
+def parse_numeric_answer(answer: str) -> tuple | None:
+    """(low, high, unit, decimals) for answers like "87.4 g", "10-15 cm", "~2 kg" or "3.1 ± 0.2"; None otherwise.
+
+    unit is "" for bare numbers and decimals the most digits after the point the answer gives.
+    Anything with extra words (sexes, locations, several values) does not parse and is left to the LLM.
+    """
+    match = ANSWER_RE.match(answer.strip().strip("[]").strip().rstrip("."))
+    if not match:
+        return None
+    low = _number(match["low"])
+    high = _number(match["high"]) if match["high"] else low
+    if high < low:
+        return None
+    decimals = max(_decimals(match["low"]), _decimals(match["high"] or ""))
+    return low, high, (match["unit"] or "").strip(), decimals
+
+
+def _canonical_unit(unit: str) -> str:
+    if unit in UNIT_ALIASES:
+        return UNIT_ALIASES[unit]
+    if any(unit in factors for factors in UNITS.values()):
+        return unit
+    if len(unit) >= CASE_INSENSITIVE_MIN_LENGTH and unit.lower() in UNIT_ALIASES:
+        return UNIT_ALIASES[unit.lower()]
+    return unit
+
+
+def _dimension(unit: str) -> tuple:
+    """(dimension, canonical unit) of a unit; unknown units form their own dimension."""
+    key = _canonical_unit(unit)
+    for dimension, factors in UNITS.items():
+        if key in factors:
+            return dimension, key
+    return key, key
+
+
+def _visible(value: float, decimals: int) -> int:
+    """At least decimals, and enough for a nonzero value to keep one significant digit."""
+    return max(decimals, -math.floor(math.log10(abs(value)))) if value else decimals
+
+
+def _format(value: float, decimals: int) -> str:
+    return f"{value:.{decimals}f}"
+
+
+def local_consensus(answers: list) -> str | None:
+    """Consensus of numeric answers without the LLM: "<mean> +/- <half range> <unit>".
+
+    Each answer contributes its midpoint to the mean and its ends to the range. Answers in
+    different units of one dimension (g/kg, mm/cm/m, days/months/years) are converted to the
+    most common unit among them. Values keep the precision of the most precise answer, with
+    more decimals only where the result would otherwise round to zero. Returns None when any
+    answer is not a plain number or range, or the units cannot be reconciled, so the caller
+    can ask the LLM instead.
+    """
+    parsed = [parse_numeric_answer(str(a)) for a in answers]
+    if not parsed or any(p is None for p in parsed):
+        return None
+    dimensions = {_dimension(unit)[0] for _, _, unit, _ in parsed}
+    if len(dimensions) != 1:
+        return None
+    dimension = dimensions.pop()
+
+    # report in the most common unit, spelled as in the answers
+    unit = Counter(unit for _, _, unit, _ in parsed).most_common(1)[0][0]
+    factors = UNITS.get(dimension)
+    target = factors[_dimension(unit)[1]] if factors else 1.0
+    lows, highs, mids = [], [], []
+    for low, high, answer_unit, _ in parsed:
+        scale = factors[_dimension(answer_unit)[1]] / target if factors else 1.0
+        lows.append(low * scale)
+        highs.append(high * scale)
+        mids.append((low + high) / 2 * scale)
+
+    mean = sum(mids) / len(mids)
+    half_range = (max(highs) - min(lows)) / 2
+    decimals = max(d for _, _, _, d in parsed)
+    decimals = _visible(half_range, decimals) if half_range else _visible(mean, decimals)
+    text = _format(mean, decimals) if not half_range else f"{_format(mean, decimals)} +/- {_format(half_range, decimals)}"
+    return f"{text} {unit}".strip()
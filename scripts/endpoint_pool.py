@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import asyncio
+from urllib.parse import urlparse
+from openai import AsyncOpenAI, APIStatusError
+from dotenv import load_dotenv
+from rate_limit import RateLimiter
+
+load_dotenv()
+
+# configuration
+LLM_ENDPOINTS = os.getenv("LLM_ENDPOINTS", "")  # JSON file listing OpenAI-compatible endpoints; empty uses OPENAI_BASE_URL alone
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))  # consecutive failures that take an endpoint out of rotation
+LLM_BREAKER_SECONDS = float(os.getenv("LLM_BREAKER_SECONDS", "30"))  # until a health check may bring it back
+LLM_ENDPOINT_WAIT = float(os.getenv("LLM_ENDPOINT_WAIT", "300"))  # longest a request waits for a healthy endpoint
+HEALTH_CHECK_TIMEOUT = 10.0
+UNLIMITED = 1_000_000
+
+
+class NoEndpointAvailable(Exception):
+    pass
+
+
+class EndpointFailover(Exception):
+    """Raised for an in-flight request moved off an endpoint whose circuit opened."""
+
+
+class Endpoint:
+    """One OpenAI-compatible server: its client, rate limiter, concurrency limit and circuit breaker state.
+
+    model is the model name sent to this server; serves lists the model names requests may ask
+    for (None: any, sent unchanged), so e.g. a hosted fallback can stand in for a local model.
+    """
+
+    def __init__(self, base_url: str = None, api_key: str = None, model: str = None, serves: list = None,
+                 concurrency: int = UNLIMITED, rpm: float = 0, tpm: float = 0, timeout: float = 600, name: str = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.serves = set(serves) if serves is not None else ({model} if model else None)
+        self.concurrency = max(1, int(concurrency))
+        self.rate_limiter = RateLimiter(rpm, tpm)
+        self.timeout = timeout
+        self.name = name or (urlparse(base_url).netloc if base_url else "api.openai.com")
+        self.active = 0  # requests dispatched here and not yet released
+        self.failures = 0  # consecutive
+        self.open_until = 0.0  # out of rotation until this time (monotonic); 0 while healthy
+        self.checking = False
+        self.requests = 0
+        self.errors = 0
+        self.circuit_opens = 0
+        self._in_flight = set()
+        self._moved = set()
+        self._client = None
+        self._client_loop = None
+
+    def client(self) -> AsyncOpenAI:
+        """AsyncOpenAI client bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            # retries are handled by llm_client so every attempt goes through the pool and the rate limiter
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0, timeout=self.timeout)
+            self._client_loop = loop
+        return self._client
+
+    def accepts(self, model: str) -> bool:
+        return self.serves is None or model in self.serves
+
+    def model_for(self, model: str) -> str:
+        return self.model or model
+
+    @property
+    def healthy(self) -> bool:
+        return not self.open_until
+
+    def as_dict(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "circuit_opens": self.circuit_opens,
+                "rate_limit_responses": self.rate_limiter.throttled}
+
+
+class EndpointPool:
+    """OpenAI-compatible endpoints that chat requests are spread over.
+
+    Each request goes to the least-loaded healthy endpoint serving its model (requests in flight
+    relative to the endpoint's concurrency limit, endpoints paused by a 429 last). After
+    breaker_failures consecutive failures an endpoint's circuit opens: it leaves the rotation,
+    its in-flight requests are moved to other endpoints, and after breaker_seconds a health check
+    (GET /models) decides whether it comes back.
+    """
+
+    def __init__(self, endpoints: list, breaker_failures: int = LLM_BREAKER_FAILURES,
+                 breaker_seconds: float = LLM_BREAKER_SECONDS, wait: float = LLM_ENDPOINT_WAIT):
+        if not endpoints:
+            raise ValueError("an endpoint pool needs at least one endpoint")
+        self.endpoints = endpoints
+        self.breaker_failures = max(1, breaker_failures)
+        self.breaker_seconds = breaker_seconds
+        self.wait = wait
+        self._event = None
+        self._event_loop = None
+
+    @property
+    def throttled(self) -> int:
+        return sum(e.rate_limiter.throttled for e in self.endpoints)
+
+    def cache_scope(self) -> str:
+        """Server part of response cache keys: the base URL of a single endpoint, else the pool as a whole."""
+        if len(self.endpoints) == 1:
+            return str(self.endpoints[0].client().base_url)
+        return "endpoint-pool"
+
+    def _changed(self) -> asyncio.Event:
+        """Event set at the next release or health change."""
+        loop = asyncio.get_running_loop()
+        if self._event is None or self._event_loop is not loop:
+            self._event = asyncio.Event()
+            self._event_loop = loop
+        return self._event
+
+    def _notify(self):
+        changed = self._changed()
+        self._event = asyncio.Event()
+        changed.set()
+
+    def _pick(self, model: str, avoid) -> Endpoint | None:
+        usable = [e for e in self.endpoints if e.accepts(model) and e.healthy and e.active < e.concurrency]
+        if not usable:
+            return None
+        return min(usable, key=lambda e: (e in avoid, e.rate_limiter.paused(), e.active / e.concurrency, e.active))
+
+    async def acquire(self, model: str, avoid=()) -> Endpoint:
+        """Reserve a slot on the best endpoint for model, preferring endpoints not in avoid.
+
+        Waits up to `wait` seconds while every endpoint serving the model is busy or out of rotation.
+        """
+        if not any(e.accepts(model) for e in self.endpoints):
+            raise ValueError(f"No LLM endpoint serves model {model}; check LLM_ENDPOINTS")
+        deadline = time.monotonic() + self.wait
+        while True:
+            self._start_health_checks()
+            endpoint = self._pick(model, avoid)
+            if endpoint is not None:
+                endpoint.active += 1
+                endpoint.requests += 1
+                return endpoint
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise NoEndpointAvailable(f"no healthy LLM endpoint for {model} within {self.wait:.0f}s")
+            try:
+                await asyncio.wait_for(self._changed().wait(), min(remaining, self._next_check_in(), 1.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, endpoint: Endpoint):
+        endpoint.active -= 1
+        self._notify()
+
+    async def send(self, endpoint: Endpoint, request):
+        """Await request(client) on the endpoint; raises EndpointFailover if the endpoint's circuit opens meanwhile."""
+        task = asyncio.ensure_future(request(endpoint.client()))
+        endpoint._in_flight.add(task)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if task in endpoint._moved:
+                raise EndpointFailover(endpoint.name) from None
+            raise
+        finally:
+            endpoint._in_flight.discard(task)
+            endpoint._moved.discard(task)
+
+    def success(self, endpoint: Endpoint):
+        endpoint.failures = 0
+
+    def failure(self, endpoint: Endpoint):
+        """Count a connection error or server error; opens the circuit after breaker_failures in a row."""
+        endpoint.errors += 1
+        endpoint.failures += 1
+        if endpoint.healthy and endpoint.failures >= self.breaker_failures:
+            self._open(endpoint)
+
+    def has_alternative(self, model: str, endpoint: Endpoint) -> bool:
+        return any(e is not endpoint and e.accepts(model) and e.healthy for e in self.endpoints)
+
+    def _open(self, endpoint: Endpoint):
+        endpoint.open_until = time.monotonic() + self.breaker_seconds
+        endpoint.circuit_opens += 1
+        print(f"      LLM endpoint {endpoint.name} out of rotation for {self.breaker_seconds:.0f}s "
+              f"after {endpoint.failures} failures")
+        # move requests still waiting on it, unless there is nowhere to move them
+        if any(e.healthy for e in self.endpoints):
+            for task in list(endpoint._in_flight):
+                endpoint._moved.add(task)
+                task.cancel()
+
+    def _next_check_in(self) -> float:
+        now = time.monotonic()
+        waits = [e.open_until - now for e in self.endpoints if not e.healthy and not e.checking]
+        return max(0.05, min(waits)) if waits else 1.0
+
+    def _start_health_checks(self):
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            if not endpoint.healthy and not endpoint.checking and endpoint.open_until <= now:
+                endpoint.checking = True
+                asyncio.ensure_future(self._health_check(endpoint))
+
+    async def _health_check(self, endpoint: Endpoint):
+        try:
+            await endpoint.client().with_options(timeout=HEALTH_CHECK_TIMEOUT).models.list()
+            healthy = True
+        except APIStatusError as e:
+            healthy = e.status_code < 500  # it answers; /models is just not implemented or not allowed
+        except Exception:
+            healthy = False
+        finally:
+            endpoint.checking = False
+        if healthy:
+            endpoint.open_until = 0.0
+            endpoint.failures = 0
+            print(f"      LLM endpoint {endpoint.name} back in rotation")
+        else:
+            endpoint.open_until = time.monotonic() + self.breaker_seconds
+        self._notify()
+
+    def summary(self) -> str:
+        return "\n".join(f"  {e.name}: {e.requests} requests, {e.errors} errors, {e.circuit_opens} circuit opens, "
+                         f"{e.rate_limiter.throttled} rate limit responses" for e in self.endpoints)
+
+
+def load_endpoints(path: str, default_model: str, required=()) -> list:
+    """Endpoints from a JSON list of {"base_url", "api_key" or "api_key_env", "model", "serves",
+    "concurrency", "rpm", "tpm", "timeout"} objects. An entry without model sends default_model,
+    unless it lists serves: then each request is sent with the model name it asked for.
+
+    Raises ValueError if a model name in required (empty names are skipped) is served by none of them.
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    endpoints = []
+    for entry in entries:
+        api_key = entry.get("api_key") or os.getenv(entry.get("api_key_env") or "OPENAI_API_KEY") or "none"
+        model = entry.get("model") or (None if "serves" in entry else default_model)
+        endpoints.append(Endpoint(
+            base_url=entry.get("base_url"), api_key=api_key, model=model, serves=entry.get("serves", [model]),
+            concurrency=entry.get("concurrency") or UNLIMITED, rpm=entry.get("rpm", 0), tpm=entry.get("tpm", 0),
+            timeout=entry.get("timeout", 600), name=entry.get("name"),
+        ))
+    unserved = [m for m in dict.fromkeys(filter(None, required)) if not any(e.accepts(m) for e in endpoints)]
+    if unserved:
+        raise ValueError(f"No endpoint in {path} serves {', '.join(unserved)}; add it to an endpoint's \"serves\" list")
+    return endpoints
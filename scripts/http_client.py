@@ -0,0 +1,232 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from dotenv import load_dotenv
+from rate_limit import retry_after_seconds
+from run_control import run_control
+load_dotenv()
+
+# configuration
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_PER_HOST_CONCURRENCY = int(os.getenv("HTTP_PER_HOST_CONCURRENCY", "8"))
+HTTP_HOST_LIMITS = os.getenv("HTTP_HOST_LIMITS", "")  # e.g. "api.iucnredlist.org=4,www.ebi.ac.uk=16"
+HTTP_POOL_SIZE = 32
+HTTP_BACKOFF_BASE = 1.0  # seconds; doubled per attempt, with full jitter
+HTTP_BACKOFF_CAP = 60.0
+CONDITIONAL_CACHE_BYTES = 64 * 1024 * 1024  # total body bytes kept for revalidation
+CONDITIONAL_CACHE_MAX_BODY = 1024 * 1024  # only small bodies (search results, assessments) are kept
+CONDITIONAL_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, float("inf"))
+
+
+def _parse_host_limits(spec: str) -> dict:
+    limits = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        host, _, limit = item.partition("=")
+        try:
+            limits[host.strip()] = int(limit)
+        except ValueError:
+            print(f"Ignoring invalid HTTP_HOST_LIMITS entry: {item}")
+    return limits
+
+
+class HostStats:
+    """Request counts and a latency histogram for one host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def record(self, seconds: float):
+        self.requests += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the histogram bucket containing the q-th quantile."""
+        target = q * sum(self.buckets)
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests, "retries": self.retries, "errors": self.errors, "not_modified": self.not_modified,
+            "latency_histogram": {str(b): c for b, c in zip(LATENCY_BUCKETS, self.buckets)},
+        }
+
+
+class _Validated:
+    """What revalidation needs of a response: its validators, content type and body."""
+
+    __slots__ = ("url", "headers", "body", "encoding")
+
+    def __init__(self, response: requests.Response):
+        self.url = response.url
+        self.headers = {h: response.headers[h] for h in CONDITIONAL_HEADERS if h in response.headers}
+        self.body = response.content
+        self.encoding = response.encoding
+
+    def response(self) -> requests.Response:
+        """A fresh 200 response carrying the stored body."""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response._content = self.body
+        return response
+
+
+def _release_on_close(response: requests.Response, slot: threading.BoundedSemaphore):
+    """Keep a streamed response's host slot until the response is closed."""
+    close = response.close
+    held = [True]
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            if held[0]:
+                held[0] = False
+                slot.release()
+
+    response.close = close_and_release
+
+
+class HttpClient:
+    """Shared HTTP client for Europe PMC and IUCN calls.
+
+    Keeps keep-alive connection pools in one requests.Session, caps concurrent requests per host,
+    retries connection errors, 429 and 5xx responses with exponential backoff and full jitter
+    (honouring Retry-After), revalidates small GET responses with ETag/If-Modified-Since, and
+    records per-host latency histograms. A streamed response holds its host slot until it is
+    closed, so use it as a context manager.
+    """
+
+    def __init__(self, max_retries: int = HTTP_MAX_RETRIES, per_host_concurrency: int = HTTP_PER_HOST_CONCURRENCY,
+                 host_limits: dict = None):
+        self.max_retries = max_retries
+        self.per_host_concurrency = per_host_concurrency
+        self.host_limits = host_limits if host_limits is not None else _parse_host_limits(HTTP_HOST_LIMITS)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.stats = {}
+        self._slots = {}
+        self._validated = OrderedDict()  # request key -> _Validated
+        self._validated_bytes = 0
+        self._lock = threading.Lock()
+
+    def _host_state(self, host: str):
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.host_limits.get(host, self.per_host_concurrency))
+                self.stats[host] = HostStats()
+            return self._slots[host], self.stats[host]
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        retry_after = retry_after_seconds(response.headers) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, HTTP_BACKOFF_CAP)
+        return random.uniform(0, min(HTTP_BACKOFF_CAP, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+    def get(self, url: str, params: dict = None, headers: dict = None, timeout: float = 30,
+            stream: bool = False, conditional: bool = True) -> requests.Response:
+        """GET with pooling, retries and revalidation. Raises requests.RequestException if every attempt fails to connect."""
+        host = urlparse(url).netloc
+        slots, stats = self._host_state(host)
+        key = f"{url}?{urlencode(sorted((params or {}).items()))}"
+        conditional = conditional and not stream
+
+        for attempt in range(self.max_retries + 1):
+            run_control.wait()  # held while the run is paused; raises once it is cancelled
+            request_headers = dict(headers or {})
+            with self._lock:
+                cached = self._validated.get(key) if conditional else None
+            if cached is not None:
+                if cached.headers.get("ETag"):
+                    request_headers["If-None-Match"] = cached.headers["ETag"]
+                if cached.headers.get("Last-Modified"):
+                    request_headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+            slots.acquire()
+            try:
+                start = time.monotonic()
+                response = self.session.get(url, params=params, headers=request_headers, timeout=timeout, stream=stream)
+                stats.record(time.monotonic() - start)
+            except (requests.ConnectionError, requests.Timeout):
+                slots.release()
+                stats.errors += 1
+                if attempt == self.max_retries:
+                    raise
+                stats.retries += 1
+                run_control.sleep(self._backoff(attempt))
+                continue
+            except BaseException:
+                slots.release()
+                raise
+            if stream:
+                _release_on_close(response, slots)
+            else:
+                slots.release()
+
+            if response.status_code == 304 and cached is not None:
+                stats.not_modified += 1
+                with self._lock:
+                    if key in self._validated:
+                        self._validated.move_to_end(key)
+                return cached.response()
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                stats.retries += 1
+                wait = self._backoff(attempt, response)
+                response.close()
+                run_control.sleep(wait)
+                continue
+
+            if response.status_code >= 400:
+                stats.errors += 1
+            elif (conditional and response.status_code == 200
+                  and (response.headers.get("ETag") or response.headers.get("Last-Modified"))
+                  and len(response.content) <= CONDITIONAL_CACHE_MAX_BODY):
+                self._remember(key, _Validated(response))
+            return response
+
+    def _remember(self, key: str, entry: _Validated):
+        with self._lock:
+            old = self._validated.pop(key, None)
+            if old is not None:
+                self._validated_bytes -= len(old.body)
+            self._validated[key] = entry
+            self._validated_bytes += len(entry.body)
+            while self._validated_bytes > CONDITIONAL_CACHE_BYTES:
+                _, evicted = self._validated.popitem(last=False)
+                self._validated_bytes -= len(evicted.body)
+
+    def summary(self) -> str:
+        lines = []
+        for host, s in sorted(self.stats.items()):
+            lines.append(f"  {host}: {s.requests} requests, p50 {s.percentile(0.5):g}s, p95 {s.percentile(0.95):g}s, "
+                         f"{s.retries} retries, {s.errors} errors, {s.not_modified} not modified")
+        return "\n".join(lines)
+
+
+http_client = HttpClient()
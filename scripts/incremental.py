@@ -0,0 +1,69 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from http_client import HTTP_PER_HOST_CONCURRENCY
+from inputs import filled_cells
+from job_store import JobStore
+load_dotenv()
+
+# configuration
+INCREMENTAL = os.getenv("INCREMENTAL", "0") == "1"  # keep filled cells and finished pairs; process only new or changed pairs
+REFRESH_NEW_PAPERS = os.getenv("REFRESH_NEW_PAPERS", "0") == "1"  # incremental runs also redo kept pairs with papers published since the last run
+
+
+def last_run_date(store: JobStore, output_path: str) -> str | None:
+    """UTC date (YYYY-MM-DD) of the last finished run: from the job store, else the previous output's modification time."""
+    finished = store.last_finished()
+    if finished is None and os.path.exists(output_path):
+        finished = os.path.getmtime(output_path)
+    return time.strftime("%Y-%m-%d", time.gmtime(finished)) if finished is not None else None
+
+
+def cells_to_keep(species_list: list, traits_list: list, trait_descriptions: dict, store: JobStore,
+                  input_values: dict, output_path: str, refresh=None) -> dict:
+    """{(species, trait): value} of the cells an incremental run keeps; every other pair is processed.
+
+    Cells filled in the input are always kept. Other pairs keep the value of a pair finished in
+    the job store, or else of a filled cell in the previous output, unless the trait's description
+    has changed since; pairs finished without a value are kept (empty) as well. refresh(species,
+    trait), if given, is asked about each of those, and the pair is recomputed when it returns True.
+    """
+    previous = filled_cells(output_path) if os.path.exists(output_path) else {}
+    old_descriptions = store.get_trait_descriptions() or {}
+    kept, refreshable = {}, []
+    for species in species_list:
+        for trait in traits_list:
+            key = (species, trait)
+            if key in input_values:
+                kept[key] = input_values[key]
+                continue
+            desc = trait_descriptions.get(trait, "")
+            value = store.get_result(species, trait, desc)
+            if value is None and old_descriptions.get(trait, desc) == desc:
+                value = previous.get(key)
+            if value is not None:
+                kept[key] = value
+                refreshable.append(key)
+
+    if refresh and refreshable:
+        # one date-filtered search per pair; the HTTP client caps concurrency per host
+        with ThreadPoolExecutor(HTTP_PER_HOST_CONCURRENCY) as pool:
+            for key, stale in zip(refreshable, pool.map(lambda k: refresh(*k), refreshable)):
+                if stale:
+                    del kept[key]
+    return kept
+
+
+def apply_to_store(store: JobStore, kept: dict, species_list: list, traits_list: list, trait_descriptions: dict):
+    """Record kept cells as finished pairs and clear the finished pairs that are to be recomputed."""
+    for species in species_list:
+        for trait in traits_list:
+            desc = trait_descriptions.get(trait, "")
+            if (species, trait) in kept:
+                value = kept[(species, trait)]
+                if store.get_result(species, trait, desc) != value:
+                    store.start_pair(species, trait, desc)
+                    store.save_result(species, trait, value)
+            elif store.get_result(species, trait) is not None:
+                store.reset_pair(species, trait)
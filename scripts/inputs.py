@@ -0,0 +1,56 @@
+import os
+import pandas as pd
+
+EMPTY_VALUES = ("", "N/A")  # unfilled cells, in inputs and in outputs (see result_sink.MISSING)
+
+
+def load_species_table(path: str) -> tuple:
+    """(species_list, traits_list) from a CSV or Excel file: first column species, remaining columns traits."""
+    if path.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(path)
+    elif path.lower().endswith('.csv'):
+        df = pd.read_csv(path)
+    else:
+        raise ValueError("Unsupported file type. Please upload an Excel or CSV file.")
+
+    species_list = df.iloc[:, 0].dropna().astype(str).tolist()  # first col = species
+    traits_list = df.columns[1:].astype(str).tolist()  # rest = traits
+    return species_list, traits_list
+
+
+def read_table(path: str) -> pd.DataFrame:
+    """A CSV, Excel, Parquet or Arrow/Feather table, CSV and Excel cells read as strings."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(path)
+    if ext in (".arrow", ".feather"):
+        return pd.read_feather(path)
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(path, dtype=str)
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def filled_cells(path: str) -> dict:
+    """{(species, trait): value} of the non-empty cells of a species table (an input file or a previous output)."""
+    df = read_table(path)
+    traits = df.columns[1:].astype(str).tolist()
+    cells = {}
+    for row in df.itertuples(index=False):
+        if pd.isna(row[0]):
+            continue
+        for trait, value in zip(traits, row[1:]):
+            if not pd.isna(value) and str(value).strip() not in EMPTY_VALUES:
+                cells[(str(row[0]), trait)] = str(value).strip()
+    return cells
+
+
+def load_trait_descriptions(path: str, traits_list: list) -> dict:
+    """{trait: description} for each trait, from a UTF-8 file of "trait: description" lines (case-insensitive)."""
+    parsed_descriptions = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if ":" in line:
+                trait, desc = line.split(":", 1)
+                clean_trait = trait.strip().lower().lstrip("\ufeff")  # remove BOM if exists
+                parsed_descriptions[clean_trait] = desc.strip()
+    return {t: parsed_descriptions.get(t.strip().lower(), "") for t in traits_list}
@@ -0,0 +1,108 @@
+import re
+from lxml import etree
+
+SKIP_TAGS = {"ref-list", "ack", "fn-group", "glossary", "notes", "contrib-group", "aff", "author-notes", "permissions"}
+INLINE_BLOCKS = {"table-wrap", "fig", "disp-formula", "supplementary-material"}
+
+
+def _local(el) -> str:
+    return etree.QName(el).localname if isinstance(el.tag, str) else ""
+
+
+def _text(el, skip=INLINE_BLOCKS) -> str:
+    """Whitespace-normalized text of el, leaving out nested block elements (tables, figures)."""
+    parts = []
+
+    def walk(node):
+        if node is not el and _local(node) in skip:
+            if node.tail:
+                parts.append(node.tail)
+            return
+        if node.text and isinstance(node.tag, str):
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+        if node is not el and node.tail:
+            parts.append(node.tail)
+
+    walk(el)
+    return re.sub(r"\s+", " ", "".join(parts)).strip()
+
+
+def _table_lines(table_wrap) -> list:
+    lines = []
+    caption = " ".join(filter(None, (_text(c) for c in table_wrap if _local(c) in ("label", "caption"))))
+    if caption:
+        lines.append(f"Table: {caption}")
+    for row in table_wrap.iter("{*}tr", "tr"):
+        cells = [_text(cell, skip=()) for cell in row if _local(cell) in ("td", "th")]
+        if any(cells):
+            lines.append(" | ".join(cells))
+    for foot in table_wrap.iter("{*}table-wrap-foot", "table-wrap-foot"):
+        text = _text(foot, skip=())
+        if text:
+            lines.append(text)
+    return lines
+
+
+def _block_lines(el) -> list:
+    """Lines for a table, figure or other block element nested in the body."""
+    name = _local(el)
+    if name == "table-wrap":
+        return _table_lines(el)
+    if name == "fig":
+        caption = " ".join(filter(None, (_text(c) for c in el if _local(c) in ("label", "caption"))))
+        return [f"Figure: {caption}"] if caption else []
+    return []
+
+
+def _walk(el, lines: list):
+    name = _local(el)
+    if not name or name in SKIP_TAGS:
+        return
+    if name in ("title", "article-title") and _local(el.getparent()) in ("sec", "title-group", "app", "abstract"):
+        text = _text(el)
+        if text:
+            lines.append("")
+            lines.append(text)
+        return
+    if name == "p":
+        text = _text(el)
+        if text:
+            lines.append(text)
+        for block in el.iter():
+            if block is not el and _local(block) in INLINE_BLOCKS:
+                lines.extend(_block_lines(block))
+        return
+    if name in INLINE_BLOCKS:
+        lines.extend(_block_lines(el))
+        return
+    if name == "abstract":
+        lines.append("")
+        lines.append("Abstract")
+    for child in el:
+        _walk(child, lines)
+
+
+def jats_to_text(xml_bytes: bytes) -> str:
+    """Convert Europe PMC / PMC JATS full-text XML into sectioned plain text.
+
+    Keeps the title, abstract, section headings, paragraphs, table rows (cells joined by " | ")
+    and figure/table captions; drops references, acknowledgements and author metadata.
+    """
+    parser = etree.XMLParser(resolve_entities=False, no_network=True, recover=True, huge_tree=True)
+    root = etree.fromstring(xml_bytes, parser)
+    if root is None:
+        return ""
+    lines = []
+    front = next(root.iter("{*}front", "front"), None)
+    if front is not None:
+        for node in front.iter("{*}article-title", "article-title", "{*}abstract", "abstract"):
+            if _local(node) == "abstract" and _local(node.getparent()) == "abstract":
+                continue
+            _walk(node, lines)
+    for section in ("body", "back"):
+        node = next(root.iter(f"{{*}}{section}", section), None)
+        if node is not None:
+            _walk(node, lines)
+    return "\n".join(lines).strip()
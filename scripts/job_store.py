@@ -0,0 +1,165 @@
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS pairs (
+    species TEXT, trait TEXT, trait_desc TEXT, status TEXT, iucn_value TEXT, value TEXT, updated REAL,
+    PRIMARY KEY (species, trait)
+);
+CREATE TABLE IF NOT EXISTS candidates (
+    species TEXT, trait TEXT, rank INTEGER, pmcid TEXT,
+    PRIMARY KEY (species, trait, rank)
+);
+CREATE TABLE IF NOT EXISTS papers (
+    species TEXT, trait TEXT, pmcid TEXT, fetched INTEGER, value TEXT, updated REAL,
+    PRIMARY KEY (species, trait, pmcid)
+);
+CREATE TABLE IF NOT EXISTS abstracts (
+    species TEXT, trait TEXT, pmcid TEXT, value TEXT,
+    PRIMARY KEY (species, trait, pmcid)
+);
+"""
+
+
+class JobStore:
+    """SQLite record of per-pair progress so an interrupted run can resume where it stopped.
+
+    For each species-trait pair it keeps the status, the IUCN answer, the candidate PMCIDs in
+    search-rank order, the answers found in their abstracts, every paper read so far with its
+    answer, and the final consensus value.
+    Every write is committed immediately (WAL journal), so a crash loses at most the call in flight.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # job lifecycle
+
+    def begin(self, resume: bool = True, keep_finished: bool = False) -> bool:
+        """Start a run. Returns True when resuming an unfinished run, else clears old state.
+
+        With keep_finished (incremental runs), the results of a finished run are kept too.
+        """
+        status = self._execute("SELECT value FROM job WHERE key = 'status'")
+        resuming = resume and bool(status) and status[0][0] == "running"
+        if not resuming and not keep_finished:
+            with self._lock:
+                self._conn.executescript("DELETE FROM pairs; DELETE FROM candidates; DELETE FROM papers; DELETE FROM abstracts;")
+        self._execute("INSERT OR REPLACE INTO job VALUES ('status', 'running')")
+        return resuming
+
+    def finish(self):
+        self._execute("INSERT OR REPLACE INTO job VALUES ('status', 'finished')")
+        self._execute("INSERT OR REPLACE INTO job VALUES ('finished_at', ?)", (str(time.time()),))
+
+    def last_finished(self) -> float | None:
+        """Time the last run on this store finished, or None."""
+        row = self._execute("SELECT value FROM job WHERE key = 'finished_at'")
+        return float(row[0][0]) if row else None
+
+    def get_trait_descriptions(self) -> dict | None:
+        """Trait descriptions of the last run started on this store, or None if not recorded."""
+        row = self._execute("SELECT value FROM job WHERE key = 'trait_descriptions'")
+        return json.loads(row[0][0]) if row else None
+
+    def save_trait_descriptions(self, trait_descriptions: dict):
+        self._execute("INSERT OR REPLACE INTO job VALUES ('trait_descriptions', ?)", (json.dumps(trait_descriptions),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # pairs
+
+    def start_pair(self, species: str, trait: str, trait_desc: str = ""):
+        """Register a pair; a changed trait description discards its previous progress."""
+        row = self._execute("SELECT trait_desc FROM pairs WHERE species = ? AND trait = ?", (species, trait))
+        if row and row[0][0] == trait_desc:
+            return
+        self.reset_pair(species, trait)
+        self._execute(
+            "INSERT INTO pairs (species, trait, trait_desc, status, updated) VALUES (?, ?, ?, 'started', ?)",
+            (species, trait, trait_desc, time.time())
+        )
+
+    def reset_pair(self, species: str, trait: str):
+        for table in ("pairs", "candidates", "papers", "abstracts"):
+            self._execute(f"DELETE FROM {table} WHERE species = ? AND trait = ?", (species, trait))
+
+    def get_result(self, species: str, trait: str, trait_desc: str = None) -> str | None:
+        """Final value of a completed pair (computed with trait_desc, if given), else None."""
+        row = self._execute("SELECT value, trait_desc FROM pairs WHERE species = ? AND trait = ? AND status = 'done'",
+                            (species, trait))
+        if not row or (trait_desc is not None and row[0][1] != trait_desc):
+            return None
+        return row[0][0]
+
+    def save_result(self, species: str, trait: str, value: str):
+        self._execute(
+            "UPDATE pairs SET status = 'done', value = ?, updated = ? WHERE species = ? AND trait = ?",
+            (value, time.time(), species, trait)
+        )
+
+    def get_iucn_value(self, species: str, trait: str) -> str | None:
+        row = self._execute("SELECT iucn_value FROM pairs WHERE species = ? AND trait = ?", (species, trait))
+        return row[0][0] if row else None
+
+    def save_iucn_value(self, species: str, trait: str, value: str):
+        self._execute("UPDATE pairs SET iucn_value = ?, updated = ? WHERE species = ? AND trait = ?",
+                      (value, time.time(), species, trait))
+
+    # candidates and papers
+
+    def get_candidates(self, species: str, trait: str) -> list | None:
+        """Candidate PMCIDs in search-rank order, or None if the pair has not been searched yet."""
+        rows = self._execute("SELECT rank, pmcid FROM candidates WHERE species = ? AND trait = ? ORDER BY rank",
+                             (species, trait))
+        if not rows:
+            return None
+        return [pmcid for rank, pmcid in rows if rank >= 0]
+
+    def save_candidates(self, species: str, trait: str, pmcids: list):
+        # an empty result is stored as a rank -1 marker so it is not searched again
+        rows = [(species, trait, rank, pmcid) for rank, pmcid in enumerate(pmcids)] or [(species, trait, -1, "")]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM candidates WHERE species = ? AND trait = ?", (species, trait))
+                self._conn.executemany("INSERT INTO candidates VALUES (?, ?, ?, ?)", rows)
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get_paper_results(self, species: str, trait: str) -> dict:
+        """{pmcid: (fetched, value)} for every paper already read for this pair."""
+        rows = self._execute("SELECT pmcid, fetched, value FROM papers WHERE species = ? AND trait = ?", (species, trait))
+        return {pmcid: (bool(fetched), value) for pmcid, fetched, value in rows}
+
+    def save_paper_result(self, species: str, trait: str, pmcid: str, fetched: bool, value: str | None):
+        self._execute("INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?, ?, ?)",
+                      (species, trait, pmcid, int(fetched), value, time.time()))
+
+    def get_abstract_results(self, species: str, trait: str) -> dict | None:
+        """{pmcid: value} from the pair's abstract extraction, or None if it has not run yet."""
+        rows = self._execute("SELECT pmcid, value FROM abstracts WHERE species = ? AND trait = ?", (species, trait))
+        if not rows:
+            return None
+        return {pmcid: value for pmcid, value in rows if pmcid}
+
+    def save_abstract_results(self, species: str, trait: str, values: dict):
+        # no abstracts at all is stored as an empty-PMCID marker so the step is not repeated
+        rows = [(species, trait, pmcid, value) for pmcid, value in values.items()] or [(species, trait, "", None)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO abstracts VALUES (?, ?, ?, ?)", rows)
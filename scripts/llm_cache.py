@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+load_dotenv()
+
+# configuration
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "..", "cache", "llm_responses.sqlite"))
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "on").lower()  # on | off | replay
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", "0"))  # 0 = never expire
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "512"))
+
+EVICTION_CHECK_EVERY = 100  # puts between size checks
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode when a request has no cached response."""
+
+
+class ResponseCache:
+    """SQLite cache of LLM replies keyed on model, base URL and a hash of the request.
+
+    mode "on" reads and writes, "off" bypasses the cache, and "replay" only reads and raises
+    ReplayMiss instead of calling the API, to reproduce a past run at zero cost. Entries older
+    than ttl_seconds are ignored; least recently used entries are evicted above max_bytes.
+    Any object with the same key/get/put interface can replace llm_client.response_cache.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, mode: str = LLM_CACHE_MODE,
+                 ttl_seconds: float = LLM_CACHE_TTL_DAYS * 86400, max_bytes: int = int(LLM_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("on", "replay")
+
+    def _connection(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, created REAL, last_used REAL)"
+            )
+        return self._conn
+
+    @staticmethod
+    def key(model: str, base_url: str, messages: list, **params) -> str:
+        payload = json.dumps({"model": model, "base_url": base_url, "messages": messages, "params": params},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Cached reply for key, else None (raises ReplayMiss in replay mode)."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row:
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+        if self.mode == "replay":
+            raise ReplayMiss(f"no cached LLM response for request {key[:12]} (LLM_CACHE_MODE=replay)")
+        return None
+
+    def put(self, key: str, model: str, response: str):
+        if self.mode != "on":
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                         (key, model, response, len(response.encode("utf-8")), now, now))
+            self._puts += 1
+            if self._puts % EVICTION_CHECK_EVERY == 0:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        """Drop expired entries, then least recently used ones until under 90% of max_bytes."""
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+        if not self.max_bytes:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "mode": self.mode}
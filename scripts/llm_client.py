@@ -0,0 +1,101 @@
+import os
+import asyncio
+from urllib.parse import urlparse
+from openai import RateLimitError, APIConnectionError, InternalServerError
+from dotenv import load_dotenv
+from rate_limit import retry_after_seconds, parse_duration
+from llm_cache import ResponseCache
+from endpoint_pool import Endpoint, EndpointPool, EndpointFailover, load_endpoints, LLM_ENDPOINTS
+from metrics import metrics
+from run_control import run_control
+
+load_dotenv()
+
+# configuration
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-5-nano")
+TRIAGE_MODEL = os.getenv("TRIAGE_MODEL", "")  # cheap model asked first whether a paper reports the trait; empty sends every paper to LLM_MODEL
+CONSENSUS_MODEL = os.getenv("CONSENSUS_MODEL", "") or LLM_MODEL  # model that reconciles the answers of several papers
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))  # starting limits; replaced by x-ratelimit-* headers when the provider sends them
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))
+LLM_MAX_ATTEMPTS = 5
+
+
+def _build_pool() -> EndpointPool:
+    if LLM_ENDPOINTS:
+        return EndpointPool(load_endpoints(LLM_ENDPOINTS, LLM_MODEL, required=(LLM_MODEL, TRIAGE_MODEL, CONSENSUS_MODEL)))
+    # a single endpoint; the OpenAI client reads OPENAI_BASE_URL itself
+    base_url = os.getenv("OPENAI_BASE_URL")
+    return EndpointPool([Endpoint(api_key=os.getenv("OPENAI_API_KEY"), rpm=LLM_RPM, tpm=LLM_TPM,
+                                  name=urlparse(base_url).netloc if base_url else None)])
+
+
+llm_pool = _build_pool()
+response_cache = ResponseCache()
+
+
+def estimate_tokens(messages: list) -> int:
+    """Cheap prompt size estimate (~4 characters per token); headers correct any drift."""
+    return sum(len(m.get("content") or "") for m in messages) // 4 + 8 * len(messages)
+
+
+async def chat(messages: list, max_completion_tokens: int = 2000, model: str = LLM_MODEL) -> str:
+    """Send one chat completion through the response cache and the endpoint pool; return the stripped reply.
+
+    A failed or rate-limited attempt is retried on another healthy endpoint when there is one.
+    """
+    cache_key = response_cache.key(model, llm_pool.cache_scope(), messages, max_completion_tokens=max_completion_tokens)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    estimate = estimate_tokens(messages) + max_completion_tokens
+
+    avoid = ()
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        await run_control.checkpoint()
+        endpoint = await llm_pool.acquire(model, avoid)
+        avoid = (endpoint,)
+        try:
+            await endpoint.rate_limiter.acquire(estimate)
+            raw = await llm_pool.send(endpoint, lambda client: client.chat.completions.with_raw_response.create(
+                model=endpoint.model_for(model),
+                messages=messages,
+                max_completion_tokens=max_completion_tokens,
+            ))
+        except EndpointFailover:
+            print(f"      LLM request moved off {endpoint.name} (attempt {attempt+1})")
+            metrics.count("llm_retries")
+            continue
+        except RateLimitError as e:
+            headers = e.response.headers if e.response is not None else None
+            wait_time = retry_after_seconds(headers)
+            if wait_time is None and headers is not None:
+                wait_time = parse_duration(headers.get("x-ratelimit-reset-tokens") or headers.get("x-ratelimit-reset-requests"))
+            if wait_time is None:
+                wait_time = 2 ** (attempt + 1)
+            print(f"      Rate limit hit on {endpoint.name} (attempt {attempt+1}), pausing it {wait_time:.1f}s...")
+            metrics.count("llm_retries")
+            endpoint.rate_limiter.penalize(wait_time)
+            continue
+        except (APIConnectionError, InternalServerError) as e:
+            llm_pool.failure(endpoint)
+            if attempt + 1 == LLM_MAX_ATTEMPTS:
+                raise
+            print(f"      LLM request to {endpoint.name} failed (attempt {attempt+1}): {e}")
+            metrics.count("llm_retries")
+            if not llm_pool.has_alternative(model, endpoint):
+                await asyncio.sleep(2 ** attempt)
+            continue
+        finally:
+            llm_pool.release(endpoint)
+
+        llm_pool.success(endpoint)
+        endpoint.rate_limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        content = (response.choices[0].message.content or "").strip()
+        if response.usage is not None:
+            metrics.add_tokens(response.usage.prompt_tokens, response.usage.completion_tokens)
+        response_cache.put(cache_key, model, content)
+        return content
+
+    raise RuntimeError(f"LLM rate limit retries exhausted after {LLM_MAX_ATTEMPTS} attempts")
@@ -0,0 +1,140 @@
+import os
+import csv
+import json
+import time
+import threading
+import contextlib
+import contextvars
+from dotenv import load_dotenv
+load_dotenv()
+
+# configuration
+METRICS = os.getenv("METRICS", "1") == "1"  # write <output>.metrics.json/.csv run reports
+PROFILE = os.getenv("PROFILE", "0") == "1"  # write a cProfile dump (<output>.prof) of the event loop thread
+
+STAGES = ("search", "download", "parse", "tokenize", "abstract_extract", "llm_triage", "llm_extract", "iucn", "consensus")
+EVENT_FIELDS = ("t", "species", "trait", "pmcid", "stage", "seconds", "prompt_tokens", "completion_tokens")
+
+# species / trait / pmcid / stage of the code currently running; copied into tasks and to_thread calls
+_labels = contextvars.ContextVar("metrics_labels", default={})
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count, "seconds": round(self.seconds, 3), "max_seconds": round(self.max_seconds, 3),
+            "mean_seconds": round(self.seconds / self.count, 3) if self.count else 0.0,
+            "llm_calls": self.calls, "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens,
+        }
+
+
+class Metrics:
+    """Wall time per pipeline stage, LLM token usage and counters for one run.
+
+    stage() times a block (including awaits inside it) and labels() tags everything below it
+    with the species, trait or PMCID being worked on. Totals are kept per stage; individual
+    timings and LLM calls are streamed to a CSV so memory does not grow with the run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.start_run()
+
+    def start_run(self, events_path: str = None):
+        with self._lock:
+            self.started = time.monotonic()
+            self.stages = {}
+            self.counters = {}
+            self._events_file = open(events_path, "w", newline="", encoding="utf-8") if events_path else None
+            self._events = csv.writer(self._events_file) if self._events_file else None
+            if self._events:
+                self._events.writerow(EVENT_FIELDS)
+
+    @contextlib.contextmanager
+    def labels(self, **labels):
+        token = _labels.set({**_labels.get(), **labels})
+        try:
+            yield
+        finally:
+            _labels.reset(token)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.monotonic()
+        with self.labels(stage=name):
+            try:
+                yield
+            finally:
+                self._record(name, seconds=time.monotonic() - start)
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int):
+        """Token usage of one LLM response, attributed to the enclosing stage."""
+        self._record(_labels.get().get("stage", "other"), prompt_tokens=prompt_tokens or 0,
+                     completion_tokens=completion_tokens or 0)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def _record(self, stage: str, seconds: float = None, prompt_tokens: int = None, completion_tokens: int = None):
+        labels = _labels.get()
+        with self._lock:
+            stats = self.stages.setdefault(stage, StageStats())
+            if seconds is not None:
+                stats.count += 1
+                stats.seconds += seconds
+                stats.max_seconds = max(stats.max_seconds, seconds)
+            if prompt_tokens is not None:
+                stats.calls += 1
+                stats.prompt_tokens += prompt_tokens
+                stats.completion_tokens += completion_tokens
+            if self._events:
+                self._events.writerow([
+                    round(time.monotonic() - self.started, 3), labels.get("species", ""), labels.get("trait", ""),
+                    labels.get("pmcid", ""), stage, "" if seconds is None else round(seconds, 4),
+                    "" if prompt_tokens is None else prompt_tokens, "" if completion_tokens is None else completion_tokens,
+                ])
+
+    def progress_text(self, done: int, total: int) -> str:
+        """Throughput and estimated time left, e.g. "12.5 pairs/min, ETA 1h 04m"."""
+        elapsed = time.monotonic() - self.started
+        if not done or elapsed <= 0:
+            return ""
+        rate = done / elapsed
+        hours, rem = divmod(int((total - done) / rate), 3600)
+        return f"{rate * 60:.1f} pairs/min, ETA {hours}h {rem // 60:02d}m"
+
+    def report(self, extra: dict = None) -> dict:
+        with self._lock:
+            stages = {name: self.stages[name].as_dict() for name in sorted(self.stages, key=lambda s: (s not in STAGES, s))}
+            return {
+                "wall_seconds": round(time.monotonic() - self.started, 3),
+                "stages": stages,
+                "prompt_tokens": sum(s.prompt_tokens for s in self.stages.values()),
+                "completion_tokens": sum(s.completion_tokens for s in self.stages.values()),
+                "counters": dict(self.counters),
+                **(extra or {}),
+            }
+
+    def finish_run(self, report_path: str = None, extra: dict = None) -> dict:
+        """Close the event CSV and write the JSON report; returns the report."""
+        report = self.report(extra)
+        with self._lock:
+            if self._events_file:
+                self._events_file.close()
+            self._events_file = self._events = None
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return report
+
+
+metrics = Metrics()
@@ -0,0 +1,167 @@
+import os
+import shutil
+import hashlib
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+# configuration
+PAPER_CACHE_DIR = os.getenv("PAPER_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "cache", "papers"))
+PAPER_CACHE_MAX_MB = float(os.getenv("PAPER_CACHE_MAX_MB", "2048"))  # 0 disables the cache
+
+KINDS = ("pdf", "txt", "xml", "xmltxt", "iucn")  # raw PDF, PDF text, raw JATS XML, JATS text, IUCN assessment JSON
+
+
+class PaperCache:
+    """Size-bounded on-disk cache of raw PDFs and extracted text, keyed by PMCID (or taxon name for IUCN).
+
+    Entries are stored under the SHA-256 of the key. Reads bump the file mtime,
+    so eviction drops the least recently used files first once max_bytes is exceeded.
+    """
+
+    def __init__(self, cache_dir: str = PAPER_CACHE_DIR, max_bytes: int = int(PAPER_CACHE_MAX_MB * 1024 * 1024)):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = {kind: 0 for kind in KINDS}
+        self.misses = {kind: 0 for kind in KINDS}
+        self._size = None  # computed lazily on first write
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, pmcid: str, kind: str) -> str:
+        key = hashlib.sha256(pmcid.strip().upper().encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{kind}")
+
+    def get(self, pmcid: str, kind: str) -> bytes | None:
+        """Return cached bytes for (pmcid, kind), else None."""
+        if not self.enabled:
+            return None
+        path = self._path(pmcid, kind)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used
+        except OSError:
+            with self._lock:
+                self.misses[kind] += 1
+            return None
+        with self._lock:
+            self.hits[kind] += 1
+        return data
+
+    def get_text(self, pmcid: str) -> str | None:
+        data = self.get(pmcid, "txt")
+        return data.decode("utf-8") if data is not None else None
+
+    def get_file(self, pmcid: str, kind: str, dest_path: str) -> bool:
+        """Copy the cached file for (pmcid, kind) to dest_path without reading it into memory; False if not cached."""
+        if not self.enabled:
+            return False
+        path = self._path(pmcid, kind)
+        try:
+            shutil.copyfile(path, dest_path)
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses[kind] += 1
+            return False
+        with self._lock:
+            self.hits[kind] += 1
+        return True
+
+    def get_pdf_file(self, pmcid: str, dest_path: str) -> bool:
+        return self.get_file(pmcid, "pdf", dest_path)
+
+    def put(self, pmcid: str, kind: str, data: bytes):
+        """Store bytes for (pmcid, kind) atomically, then evict if over the size cap."""
+        if data is not None:
+            self._store(pmcid, kind, lambda f: f.write(data))
+
+    def put_file(self, pmcid: str, kind: str, src_path: str):
+        """Store a copy of the file at src_path for (pmcid, kind), streaming it rather than reading it into memory."""
+        def copy(f):
+            with open(src_path, "rb") as src:
+                shutil.copyfileobj(src, f)
+        self._store(pmcid, kind, copy)
+
+    def _store(self, pmcid: str, kind: str, write):
+        if not self.enabled:
+            return
+        path = self._path(pmcid, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, "wb") as f:
+                write(f)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"      Paper cache write failed for {pmcid}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def put_text(self, pmcid: str, text: str):
+        self.put(pmcid, "txt", text.encode("utf-8"))
+
+    def put_pdf_file(self, pmcid: str, src_path: str):
+        self.put_file(pmcid, "pdf", src_path)
+
+    def get_xml_text(self, pmcid: str) -> str | None:
+        data = self.get(pmcid, "xmltxt")
+        return data.decode("utf-8") if data is not None else None
+
+    def put_xml_text(self, pmcid: str, text: str):
+        self.put(pmcid, "xmltxt", text.encode("utf-8"))
+
+    def _entries(self):
+        """Yield (mtime, size, path) for every cached file."""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Remove least recently used files until the cache is at 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in sorted(self._entries()):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "size_bytes": self._size if self._size is not None else self._scan_size(),
+                "max_bytes": self.max_bytes,
+            }
+
+
+paper_cache = PaperCache()
@@ -0,0 +1,141 @@
+import os
+import io
+import signal
+import threading
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pdfplumber
+from dotenv import load_dotenv
+load_dotenv()
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# configuration
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(os.cpu_count() or 2)))
+PDF_PARSE_TIMEOUT = float(os.getenv("PDF_PARSE_TIMEOUT", "120"))  # seconds per document
+PDF_PARSE_QUEUE = int(os.getenv("PDF_PARSE_QUEUE", str(2 * PDF_PARSE_WORKERS)))  # downloaded PDFs waiting for a worker
+PDF_PARSE_MAX_CHARS = int(os.getenv("PDF_PARSE_MAX_CHARS", "600000"))  # stop reading pages after this much text; 0 reads them all
+PDF_PARSE_MAX_MEMORY_MB = float(os.getenv("PDF_PARSE_MAX_MEMORY_MB", "2048"))  # address-space cap per worker process (Unix); 0 = none
+
+
+class PdfParseTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise PdfParseTimeout()
+
+
+def parse_pdf(source, timeout: float = 0, max_chars: int = PDF_PARSE_MAX_CHARS) -> str:
+    """Extract the text of a PDF (a file path or bytes) page by page until max_chars characters.
+
+    Each page's layout objects are released once its text is extracted, so memory stays at
+    about one page plus the text. With timeout (Unix only), give up after that many seconds.
+    """
+    use_alarm = timeout and hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with pdfplumber.open(source if isinstance(source, str) else io.BytesIO(source)) as pdf:
+            pages, size = [], 0
+            for page in pdf.pages:
+                text = page.extract_text() or ""
+                page.close()
+                pages.append(text)
+                size += len(text) + 1
+                if max_chars and size >= max_chars:
+                    break
+            return "\n".join(pages)
+    except PdfParseTimeout:
+        raise
+    except Exception as e:
+        # pdfplumber re-wraps errors raised inside pdfminer, including our alarm
+        if isinstance(e.__context__, PdfParseTimeout) or isinstance(e.__cause__, PdfParseTimeout):
+            raise PdfParseTimeout() from None
+        if isinstance(e.__context__, MemoryError) or isinstance(e.__cause__, MemoryError):
+            raise MemoryError() from None
+        raise
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _limit_memory(max_mb: float):
+    """Worker initializer: cap the process's address space, so a pathological PDF raises MemoryError."""
+    if max_mb > 0 and resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = int(max_mb * 1024 * 1024)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+class PdfParsePool:
+    """Process pool that parses downloaded PDFs off the event loop and off the GIL.
+
+    Workers read the PDF from a file path, so documents are never copied between processes.
+    At most workers + queue_size PDFs are parsing or waiting at once; further downloads wait for
+    a slot. Each document gets `timeout` seconds: workers enforce it with SIGALRM where available,
+    and callers stop waiting after the timeout everywhere else. Workers stop reading pages after
+    max_chars characters and, on Unix, cannot grow beyond max_memory_mb.
+    """
+
+    def __init__(self, workers: int = PDF_PARSE_WORKERS, timeout: float = PDF_PARSE_TIMEOUT, queue_size: int = PDF_PARSE_QUEUE,
+                 max_chars: int = PDF_PARSE_MAX_CHARS, max_memory_mb: float = PDF_PARSE_MAX_MEMORY_MB):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.queue_size = max(0, queue_size)
+        self.max_chars = max_chars
+        self.max_memory_mb = max_memory_mb
+        self.timeouts = 0
+        self._executor = None
+        self._slots = None
+        self._slots_loop = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn avoids forking a process that already runs network and GUI threads
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_limit_memory, initargs=(self.max_memory_mb,))
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.workers + self.queue_size)
+            self._slots_loop = loop
+        return self._slots
+
+    async def parse(self, path: str, label: str = "") -> str | None:
+        """Text of the PDF file at path, or None if parsing failed, ran out of memory or timed out."""
+        async with self._get_slots():
+            loop = asyncio.get_running_loop()
+            try:
+                future = loop.run_in_executor(self._get_executor(), parse_pdf, path, self.timeout, self.max_chars)
+                # a little slack so the worker-side alarm normally fires first
+                return await asyncio.wait_for(future, self.timeout + 5 if self.timeout else None)
+            except (PdfParseTimeout, asyncio.TimeoutError):
+                self.timeouts += 1
+                print(f"      PDF parsing timed out after {self.timeout:.0f}s {label}")
+            except MemoryError:
+                print(f"      PDF parsing ran out of memory (PDF_PARSE_MAX_MEMORY_MB={self.max_memory_mb:g}) {label}")
+            except BrokenProcessPool:
+                print(f"      PDF parser process crashed {label}")
+                self.shutdown()
+            except Exception as e:
+                print(f"      Failed to parse PDF {label}: {e}")
+        return None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pdf_parse_pool = PdfParsePool()
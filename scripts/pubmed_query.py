@@ -1,30 +1,114 @@
 import os
-from openai import OpenAI
+import re
+import json
+import asyncio
+import contextlib
+from itertools import zip_longest
 from dotenv import load_dotenv
-import pandas as pd
 import tiktoken
 import time
-from openai import RateLimitError
-from utils import get_iucn_assessment, search_papers, fetch_pdf, parse_llm_output
+import statistics
+import cProfile
+from utils import (
+    get_iucn_assessment, get_iucn_synonyms, prune_iucn_assessment, search_hits, search_papers, search_records, fetch_paper_async,
+    parse_llm_output, parse_llm_json_output, EMPTY_ANSWERS
+)
+from paper_cache import paper_cache
+from search_cache import search_cache
+from llm_client import chat, llm_pool, response_cache, TRIAGE_MODEL, CONSENSUS_MODEL
+from llm_cache import ReplayMiss
+from job_store import JobStore
+from result_sink import ResultSink
+from metrics import metrics, METRICS, PROFILE
+from run_control import run_control, RunCancelled
+from retrieval import select_relevant_text
+from consensus import local_consensus
+from screening import PAPER_SCREENING, screen_records
+from incremental import INCREMENTAL, REFRESH_NEW_PAPERS, cells_to_keep, apply_to_store, last_run_date
+from pdf_pool import pdf_parse_pool
+from http_client import http_client
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # configuration
-LLM_MODEL = os.getenv("LLM_MODEL", "gpt-5-nano")
-
-def extract_trait_from_paper(species: str, trait: str, paper_text: str, trait_desc: str = ""):
-    """Ask LLM to extract a single trait from a single paper."""
+PAPER_WORKERS = int(os.getenv("PAPER_WORKERS", "4"))  # papers fetched/extracted concurrently per pair
+PAIR_CONCURRENCY = int(os.getenv("PAIR_CONCURRENCY", "8"))  # species-trait pairs processed concurrently
+MULTI_TRAIT = os.getenv("MULTI_TRAIT", "0") == "1"  # read each paper once for all traits of a species
+BATCH_MODE = os.getenv("BATCH_MODE", "0") == "1"  # submit LLM calls through the Batch API (see batch_mode.py)
+MAX_PAPER_TOKENS = 120000
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "0"))  # per trait; 0 sends the whole (truncated) paper
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "20"))
+ABSTRACT_TIER = os.getenv("ABSTRACT_TIER", "0") == "1"  # read the candidates' abstracts first, full text only if they fall short
+ABSTRACT_MAX_TOKENS = 1000  # per abstract
+LOCAL_CONSENSUS = os.getenv("LOCAL_CONSENSUS", "1") == "1"  # average plain numeric answers locally instead of asking the LLM
+TRIAGE_TOKEN_BUDGET = int(os.getenv("TRIAGE_TOKEN_BUDGET", "3000"))  # per trait; the paper passages TRIAGE_MODEL reads
+TRIAGE_MAX_TOKENS = 1000
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "..", "results")
+
+def search_query(species: str, trait: str) -> str:
+    """Europe PMC query for a species-trait pair, shared by the availability check and extraction."""
+    return f"wild {species} AND {trait}"
+
+def find_candidates(species: str, trait: str, trait_desc: str = "", max_results: int = 20) -> list:
+    """PMCIDs to read for a pair, in search order, or screened and reordered by their metadata (PAPER_SCREENING)."""
+    query = search_query(species, trait)
+    if not PAPER_SCREENING:
+        return search_papers(query, max_results)
+    hits = search_records(query, max_results)
+    if not hits:
+        return []
+    records = hits[1]
+    genus, sp = species.split(" ", 1) if " " in species else (species, "")
+    pmcids = screen_records(records, species, trait, trait_desc, get_iucn_synonyms(genus, sp))
+    if len(pmcids) < len(records):
+        metrics.count("papers_screened_out", len(records) - len(pmcids))
+        print(f"    Screening dropped {len(records) - len(pmcids)} of {len(records)} papers for {species} {trait}")
+    return pmcids
+
+def candidate_abstracts(species: str, trait: str, pmcids: list) -> dict:
+    """{pmcid: title and abstract} of the candidates that have an abstract, from the (cached) search metadata."""
+    hits = search_records(search_query(species, trait), 20)
+    records = {r["pmcid"]: r for r in (hits[1] if hits else [])}
+    abstracts = {}
+    for pmcid in pmcids:
+        record = records.get(pmcid)
+        if record and record.get("abstract"):
+            abstracts[pmcid] = f"{record.get('title', '')}\n{record['abstract']}"
+    return abstracts
+
+def truncate_to_tokens(text: str, max_tokens: int = MAX_PAPER_TOKENS):
+    """Cut text to at most max_tokens tokens."""
     # use generic encoding to avoid crashing on unknown model names from other providers
-    encoding = tiktoken.get_encoding("cl100k_base") 
-    tokens = encoding.encode(paper_text)
-    max_allowed_tokens = 120000
-    if len(tokens) > max_allowed_tokens:
-        tokens = tokens[:max_allowed_tokens]
-        truncated_text = encoding.decode(tokens) + "... [truncated]"
-    else:
-        truncated_text = paper_text
-
+    encoding = tiktoken.get_encoding("cl100k_base")
+    tokens = encoding.encode(text)
+    if len(tokens) > max_tokens:
+        return encoding.decode(tokens[:max_tokens]) + "... [truncated]"
+    return text
+
+def _ranked_excerpt(paper_text: str, species: str, traits: list, trait_descriptions: dict, budget: int):
+    """The paper's BM25-ranked chunks for the species and traits within budget tokens, else its truncated start."""
+    trait_descriptions = trait_descriptions or {}
+    # trait names are repeated so they outweigh words from the description
+    query = " ".join([species] + [f"{t} {t} {trait_descriptions.get(t, '')}" for t in traits])
+    return select_relevant_text(paper_text, query, budget, RETRIEVAL_TOP_K * len(traits)) or truncate_to_tokens(paper_text, budget)
+
+def paper_excerpt(paper_text: str, species: str, traits: list, trait_descriptions: dict = None):
+    """Text sent to the LLM: the best BM25-ranked chunks when retrieval is enabled, else the truncated paper."""
+    if RETRIEVAL_TOKEN_BUDGET <= 0:
+        return truncate_to_tokens(paper_text)
+    return _ranked_excerpt(paper_text, species, traits, trait_descriptions, min(MAX_PAPER_TOKENS, RETRIEVAL_TOKEN_BUDGET * len(traits)))
+
+def triage_excerpt(paper_text: str, species: str, traits: list, trait_descriptions: dict = None):
+    """The shorter view of a paper that TRIAGE_MODEL reads."""
+    return _ranked_excerpt(paper_text, species, traits, trait_descriptions, min(MAX_PAPER_TOKENS, TRIAGE_TOKEN_BUDGET * len(traits)))
+
+def _trait_lines(traits: list, trait_descriptions: dict = None) -> str:
+    """Prompt lines listing the traits, each with its description when it has one."""
+    trait_descriptions = trait_descriptions or {}
+    return "\n".join(f"    - {t}: {trait_descriptions[t]}" if trait_descriptions.get(t) else f"    - {t}" for t in traits)
+
+def build_extraction_messages(species: str, trait: str, paper_excerpt_text: str, trait_desc: str = ""):
+    """Chat messages asking for a single trait from a single paper."""
     desc_part = f" ({trait_desc})" if trait_desc else ""
     prompt = f"""
     Extract information about the WILD species {species} from the following research paper.
@@ -39,38 +123,87 @@ def extract_trait_from_paper(species: str, trait: str, paper_text: str, trait_de
     {trait}: [short fact(s)]
 
     Research paper:
-    {truncated_text}
+    {paper_excerpt_text}
     """
+    return [
+        {"role": "system", "content": "You are a helpful biology research assistant that extracts specific information from scientific papers."},
+        {"role": "user", "content": prompt}
+    ]
+
+def build_multi_extraction_messages(species: str, traits: list, paper_excerpt_text: str, trait_descriptions: dict = None):
+    """Chat messages asking for several traits from a single paper as one JSON object."""
+    trait_lines = _trait_lines(traits, trait_descriptions)
+    example = json.dumps({t: "short fact(s) or N/A" for t in traits})
+    prompt = f"""
+    Extract information about the WILD species {species} from the following research paper.
+    Focus specifically on these traits:
+{trait_lines}
 
-    for attempt in range(5): # up to 5 tries
-        try:
-            response = client.chat.completions.create(
-                model=LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a helpful biology research assistant that extracts specific information from scientific papers."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_completion_tokens=2000,
-            )
-            result = response.choices[0].message.content.strip()
-            return result
-
-        except RateLimitError as e:
-            wait_time = 60 * (attempt + 1) # backoff: 60s, 120s, etc.
-            print(f"      Rate limit hit (attempt {attempt+1}), waiting {wait_time}s...")
-            time.sleep(wait_time)
-
-        except Exception as e:
-            print(f"      Unexpected error: {e}")
-            break # don’t retry unknown errors
-
-    return f"{trait}: N/A"
-
-def summarize_answers_with_llm(species: str, trait: str, answers: list):
-    if not answers:
-        return f"{trait}: N/A"
+    Return only what is asked, in the fewest possible words.
+    Do not write full sentences, explanations, or background.
+    Output should be just the essential data points (e.g., "10 cm", "desert habitats").
+    If no information is found for a trait, use "N/A" for it.
 
-    # build summary prompt
+    Format your response EXACTLY as a JSON object with one key per trait name:
+    {example}
+
+    Research paper:
+    {paper_excerpt_text}
+    """
+    return [
+        {"role": "system", "content": "You are a helpful biology research assistant that extracts specific information from scientific papers."},
+        {"role": "user", "content": prompt}
+    ]
+
+def build_abstract_messages(species: str, trait: str, abstracts: dict, trait_desc: str = ""):
+    """Chat messages asking for a single trait from several abstracts at once, as one JSON object keyed by PMCID."""
+    desc_part = f" ({trait_desc})" if trait_desc else ""
+    abstracts_text = "\n\n".join(
+        f"[{pmcid}]\n{truncate_to_tokens(text, ABSTRACT_MAX_TOKENS)}" for pmcid, text in abstracts.items()
+    )
+    example = json.dumps({pmcid: "short fact(s) or N/A" for pmcid in abstracts})
+    prompt = f"""
+    Extract information about the WILD species {species} from each of the following paper abstracts.
+    Focus specifically on the trait: {trait}{desc_part}
+
+    Answer for each abstract separately, using only what that abstract states.
+    Return only what is asked, in the fewest possible words (e.g., "10 cm", "desert habitats").
+    If an abstract does not state the trait for this species, use "N/A" for it.
+
+    Format your response EXACTLY as a JSON object with one key per PMCID:
+    {example}
+
+    Abstracts:
+    {abstracts_text}
+    """
+    return [
+        {"role": "system", "content": "You are a helpful biology research assistant that extracts specific information from scientific papers."},
+        {"role": "user", "content": prompt}
+    ]
+
+def build_triage_messages(species: str, traits: list, paper_excerpt_text: str, trait_descriptions: dict = None):
+    """Chat messages asking whether a paper excerpt reports each trait, as one JSON object of yes/no."""
+    trait_lines = _trait_lines(traits, trait_descriptions)
+    example = json.dumps({t: "yes or no" for t in traits})
+    prompt = f"""
+    Does the following excerpt of a research paper report a value for these traits of the WILD species {species}?
+{trait_lines}
+
+    Answer "yes" only if the excerpt states the trait for this species itself, not for related species or captive animals.
+
+    Format your response EXACTLY as a JSON object with one key per trait name:
+    {example}
+
+    Research paper excerpt:
+    {paper_excerpt_text}
+    """
+    return [
+        {"role": "system", "content": "You are a biology research assistant that checks whether scientific papers contain specific information."},
+        {"role": "user", "content": prompt}
+    ]
+
+def build_consensus_messages(species: str, trait: str, answers: list):
+    """Chat messages asking to reconcile the answers found in several papers."""
     answers_text = "\n".join(f"- {a}" for a in answers)
     prompt = f"""
 You are a biology research assistant summarizing extracted values from multiple papers.
@@ -91,203 +224,724 @@ Instructions:
 Return your result in this exact format:
 {trait}: [final concise answer]
 """
+    return [
+        {"role": "system", "content": "You are a precise scientific summarizer."},
+        {"role": "user", "content": prompt}
+    ]
+
+def build_iucn_messages(species: str, traits: list, iucn_data: dict, trait_descriptions: dict = None):
+    """Chat messages asking for several traits from a (pruned) IUCN assessment as one JSON object."""
+    trait_lines = _trait_lines(traits, trait_descriptions)
+    example = json.dumps({t: "short fact(s) or N/A" for t in traits})
+    iucn_prompt = f"""
+    Extract the values of these traits for the species {species}
+    from the following IUCN Red List JSON data:
+{trait_lines}
+
+    If the JSON does not contain the information for a trait, use "N/A" for it.
+    Format your response EXACTLY as a JSON object with one key per trait name:
+    {example}
+
+    JSON:
+    {json.dumps(iucn_data, ensure_ascii=False)}
+    """
+    return [
+        {"role": "system", "content": "You are a helpful assistant that extracts factual data from structured JSON."},
+        {"role": "user", "content": iucn_prompt}
+    ]
+
+def triage_positive(value: str) -> bool:
+    """Whether a triage answer lets the paper through; anything but a plain "no" (e.g. "not sure", "none") does."""
+    return not re.match(r"no\b", value.strip().strip("*\"'").lower())
+
+async def triage_paper(species: str, traits: list, paper_text: str, trait_descriptions: dict = None) -> list:
+    """Traits the cheap TRIAGE_MODEL finds in the paper (all of them when triage is off or fails)."""
+    if not TRIAGE_MODEL:
+        return traits
+    with metrics.stage("tokenize"):
+        excerpt = await asyncio.to_thread(triage_excerpt, paper_text, species, traits, trait_descriptions)
+    try:
+        with metrics.stage("llm_triage"):
+            llm_output = await chat(build_triage_messages(species, traits, excerpt, trait_descriptions),
+                                    max_completion_tokens=TRIAGE_MAX_TOKENS, model=TRIAGE_MODEL)
+    except ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"      Triage error, reading the paper in full: {e}")
+        return traits
+    answers = parse_llm_json_output(llm_output, traits)
+    positive = [t for t in traits if triage_positive(answers[t])]
+    metrics.count("triage_negative", len(traits) - len(positive))
+    return positive
+
+async def extract_trait_from_paper(species: str, trait: str, paper_text: str, trait_desc: str = ""):
+    """Ask LLM to extract a single trait from a single paper, after TRIAGE_MODEL finds it there."""
+    if not await triage_paper(species, [trait], paper_text, {trait: trait_desc}):
+        return f"{trait}: N/A"
+    # tokenizing and ranking a whole paper is CPU work, keep it off the event loop
+    with metrics.stage("tokenize"):
+        truncated_text = await asyncio.to_thread(paper_excerpt, paper_text, species, [trait], {trait: trait_desc})
+    try:
+        with metrics.stage("llm_extract"):
+            return await chat(build_extraction_messages(species, trait, truncated_text, trait_desc))
+    except ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"      Unexpected error: {e}")
+        return f"{trait}: N/A"
+
+async def extract_traits_from_paper(species: str, traits: list, paper_text: str, trait_descriptions: dict = None):
+    """Ask LLM to extract several traits from a single paper in one call. Returns {trait: value}.
+
+    Only the traits TRIAGE_MODEL finds in the paper are asked for; the others are N/A.
+    """
+    values = {trait: "N/A" for trait in traits}
+    asked = await triage_paper(species, traits, paper_text, trait_descriptions)
+    if not asked:
+        return values
+    with metrics.stage("tokenize"):
+        truncated_text = await asyncio.to_thread(paper_excerpt, paper_text, species, asked, trait_descriptions)
+    try:
+        with metrics.stage("llm_extract"):
+            llm_output = await chat(build_multi_extraction_messages(species, asked, truncated_text, trait_descriptions))
+    except ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"      Unexpected error: {e}")
+        return values
+    values.update(parse_llm_json_output(llm_output, asked))
+    return values
 
+async def extract_trait_from_abstracts(species: str, trait: str, abstracts: dict, trait_desc: str = ""):
+    """Ask LLM for a single trait from several abstracts in one call. Returns {pmcid: value}."""
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a precise scientific summarizer."},
-                {"role": "user", "content": prompt}
-            ],
-            max_completion_tokens=2000,
-        )
+        with metrics.stage("abstract_extract"):
+            llm_output = await chat(build_abstract_messages(species, trait, abstracts, trait_desc))
+    except ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"      Unexpected error: {e}")
+        return {pmcid: "N/A" for pmcid in abstracts}
+    return parse_llm_json_output(llm_output, list(abstracts))
 
-        return response.choices[0].message.content.strip()
+async def summarize_answers_with_llm(species: str, trait: str, answers: list):
+    if not answers:
+        return f"{trait}: N/A"
+    try:
+        return await chat(build_consensus_messages(species, trait, answers), model=CONSENSUS_MODEL)
+    except ReplayMiss:
+        raise
     except Exception as e:
         print(f"    Consensus LLM error for {species} {trait}: {e}")
         return f"{trait}: N/A"
 
 
-def process_species_traits(species_list: list, traits_list: list, output_file: str, trait_descriptions: dict = None, progress_callback=None):
-    """Main helper method to process species and traits lists through the pipeline."""
-
-    start_time = time.time()
+async def extract_traits_from_iucn(species: str, traits: list, iucn_data: dict, trait_descriptions: dict = None):
+    """Ask LLM to extract several traits from a pruned IUCN assessment in one call. Returns {trait: value}."""
+    try:
+        llm_output = await chat(build_iucn_messages(species, traits, iucn_data, trait_descriptions))
+        return parse_llm_json_output(llm_output, traits)
+    except ReplayMiss:
+        raise
+    except Exception as e:
+        print(f"    IUCN LLM extraction failed for {species}: {e}")
+        return {trait: "N/A" for trait in traits}
 
-    results_dir = os.path.join(os.path.dirname(__file__), "..", "results")
-    os.makedirs(results_dir, exist_ok=True)
-    output_path = os.path.join(results_dir, output_file)
 
-    all_papers_log = os.path.join(results_dir, "all_papers.txt")
-    successful_papers_log = os.path.join(results_dir, "successful_papers.txt")
+def _log_paper(log_path: str, species: str, trait: str, pmcid: str):
+    if log_path:
+        with open(log_path, "a") as f:
+            f.write(f"{species}\t{trait}\t{pmcid}\n")
 
-    # clear previous logs if they exist
-    open(all_papers_log, "w").close()
-    open(successful_papers_log, "w").close()
 
-    # create a DataFrame with species and traits
-    data = []
-    for species in species_list:
-        row = [species] + ["N/A"] * len(traits_list)
-        data.append(row)
-    
-    df = pd.DataFrame(data, columns=["Species"] + traits_list)
-    results = df.copy()
+async def _aenumerate(aiterable, start: int = 0):
+    idx = start
+    async for item in aiterable:
+        yield idx, item
+        idx += 1
 
-    # ensure trait columns are strings to avoid dtype warnings
-    for trait in traits_list:
-        results[trait] = results[trait].astype(str)
 
-    total_steps = len(species_list) * len(traits_list)
-    steps_done = 0
+async def _in_rank_order(pmcids: list, read_paper):
+    """Yield (pmcid, result or exception) in search-rank order, keeping PAPER_WORKERS reads in flight.
 
-    # loop through each species and trait
-    for idx, row in df.iterrows():
-        species = row["Species"]
-        print(f"\nProcessing {species}...")
-
-        # grab iucn
-        genus, sp = species.split(" ", 1) if " " in species else (species, "")
-        iucn_data = get_iucn_assessment(genus, sp)
-
-        for trait in traits_list:
-            print(f"  Processing trait: {trait}")
-
-            # get trait description if provided (case-insensitive key)
-            trait_desc = ""
-            if trait_descriptions:
-                trait_desc = trait_descriptions.get(trait, "")
-
-            # IUCN + LLM PIPELINE
-            if iucn_data:
-                try:
-                    iucn_prompt = f"""
-                    Extract the value of the trait "{trait}" for the species {species}
-                    from the following IUCN Red List JSON data.
-                    {trait}: {trait_desc}
-
-                    If the JSON does not contain the information, respond with "N/A".
-                    Return your answer exactly as:
-                    {trait}: [short fact(s)]
-
-                    JSON:
-                    {iucn_data}
-                    """
-
-                    response = client.chat.completions.create(
-                        model=LLM_MODEL,
-                        messages=[
-                            {"role": "system", "content": "You are a helpful assistant that extracts factual data from structured JSON."},
-                            {"role": "user", "content": iucn_prompt}
-                        ],
-                        max_completion_tokens=2000,
-                    )
-                    llm_output = response.choices[0].message.content.strip()
-                    value = parse_llm_output(llm_output, trait)
-                    if value not in ("N/A", "[N/A]", ""):
-                        results.at[idx, trait] = value
-                        continue  # skip to next trait
-                except Exception as e:
-                    print(f"    IUCN LLM extraction failed for {trait}: {e}")
-            
-            # PUBMED API + LLM PIPELINE
-            query = f"wild {species} AND {trait}"
-            pmcids = search_papers(query, max_results=20)
-
-            if not pmcids:
-                print(f"    No papers found for {species} {trait}")
-                results.at[idx, trait] = ""
+    Closing the generator (e.g. via contextlib.aclosing when the consumer breaks out)
+    cancels papers still downloading or waiting on the LLM.
+    """
+    tasks = {}
+    next_idx = 0
+    try:
+        for paper_idx, pmcid in enumerate(pmcids):
+            while next_idx < len(pmcids) and next_idx < paper_idx + max(1, PAPER_WORKERS):
+                with metrics.labels(pmcid=pmcids[next_idx]):  # the task's context keeps the label
+                    tasks[next_idx] = asyncio.ensure_future(read_paper(pmcids[next_idx]))
+                next_idx += 1
+            try:
+                result = await tasks.pop(paper_idx)
+            except ReplayMiss:
+                raise  # the pair cannot be reproduced; see _process_all_pairs
+            except Exception as e:
+                result = e
+            yield pmcid, result
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+async def collect_abstract_answers(species: str, trait: str, pmcids: list, trait_desc: str = "", max_answers: int = 3,
+                                   all_papers_log: str = None, successful_papers_log: str = None, store: JobStore = None):
+    """Abstract tier: read the abstracts of all candidates in one LLM call.
+
+    Returns {pmcid: value} for the first max_answers papers (in search-rank order) whose
+    abstract answered; the result is kept in the job store so a resumed run does not ask again.
+    """
+    store = store or JobStore(":memory:")
+    values = store.get_abstract_results(species, trait)
+    replayed = values is not None
+    if not replayed:
+        abstracts = await asyncio.to_thread(candidate_abstracts, species, trait, pmcids)
+        values = await extract_trait_from_abstracts(species, trait, abstracts, trait_desc) if abstracts else {}
+        store.save_abstract_results(species, trait, values)
+
+    answers = {}
+    for pmcid in pmcids:
+        value = values.get(pmcid)
+        if value in EMPTY_ANSWERS:
+            continue
+        if not replayed:
+            _log_paper(all_papers_log, species, trait, pmcid)
+            _log_paper(successful_papers_log, species, trait, pmcid)
+        answers[pmcid] = value
+        if len(answers) >= max_answers:
+            break
+    return answers
+
+
+async def collect_paper_answers(species: str, trait: str, pmcids: list, trait_desc: str = "", max_answers: int = 3,
+                                all_papers_log: str = None, successful_papers_log: str = None, store: JobStore = None):
+    """Read candidate papers concurrently and return the first max_answers valid answers in search-rank order.
+
+    Papers already recorded in the job store are replayed instead of being downloaded and read again.
+    """
+    store = store or JobStore(":memory:")
+    done = store.get_paper_results(species, trait)
+
+    async def read_paper(pmcid):
+        if pmcid in done:
+            return (*done[pmcid], True)
+        paper_text = await fetch_paper_async(pmcid)
+        value = None
+        if paper_text:
+            llm_output = await extract_trait_from_paper(species, trait, paper_text, trait_desc)
+            value = parse_llm_output(llm_output, trait)
+        store.save_paper_result(species, trait, pmcid, bool(paper_text), value)
+        return bool(paper_text), value, False
+
+    answers = []
+    async with contextlib.aclosing(_in_rank_order(pmcids, read_paper)) as papers:
+        async for paper_idx, (pmcid, result) in _aenumerate(papers):
+            if isinstance(result, Exception):
+                print(f"      LLM error for {species} {trait} paper {paper_idx + 1}: {result}")
+                continue
+            fetched, value, replayed = result
+            if not fetched:
                 continue
 
-            answers = []  # store up to 3 valid extracted answers
+            # log every paper where full text was successfully retrieved
+            if not replayed:
+                _log_paper(all_papers_log, species, trait, pmcid)
 
-            for paper_idx, pmcid in enumerate(pmcids[:20]):  # check up to 20 papers
-                paper_text = fetch_pdf(pmcid)
-                if not paper_text:
+            if value not in EMPTY_ANSWERS:
+                # log successful papers (where LLM extracted a valid answer)
+                if not replayed:
+                    _log_paper(successful_papers_log, species, trait, pmcid)
+                answers.append(value)
+                if len(answers) >= max_answers:
+                    break
+
+    return answers
+
+
+async def collect_species_answers(species: str, traits: list, pmcids: list, trait_descriptions: dict = None,
+                                  max_answers: int = 3, all_papers_log: str = None, successful_papers_log: str = None,
+                                  store: JobStore = None, answers: dict = None, skip: dict = None):
+    """Read a species-level paper pool once per paper for every trait still short of max_answers.
+
+    answers holds {trait: values} found already (e.g. in abstracts) and skip {trait: pmcids}
+    papers not to read again for that trait.
+    """
+    store = store or JobStore(":memory:")
+    done = {trait: store.get_paper_results(species, trait) for trait in traits}
+    answers = {trait: list((answers or {}).get(trait, [])) for trait in traits}
+    skip = skip or {}
+
+    def pending():
+        return [t for t in traits if len(answers[t]) < max_answers]
+
+    async def read_paper(pmcid):
+        """Returns {trait: (fetched, value, replayed)} for the traits this paper was read for."""
+        results = {t: (*done[t][pmcid], True) for t in traits if pmcid in done[t]}
+        if all(t in results or pmcid in skip.get(t, ()) for t in pending()):
+            return results
+        paper_text = await fetch_paper_async(pmcid)
+        # decided after download, so traits filled meanwhile are skipped
+        traits_asked = [t for t in pending() if t not in results and pmcid not in skip.get(t, ())]
+        if not traits_asked:
+            return results
+        if paper_text:
+            values = await extract_traits_from_paper(species, traits_asked, paper_text, trait_descriptions)
+        else:
+            values = {t: None for t in traits_asked}
+        for trait in traits_asked:
+            store.save_paper_result(species, trait, pmcid, bool(paper_text), values[trait])
+            results[trait] = (bool(paper_text), values[trait], False)
+        return results
+
+    async with contextlib.aclosing(_in_rank_order(pmcids, read_paper)) as papers:
+        async for paper_idx, (pmcid, results) in _aenumerate(papers):
+            if isinstance(results, Exception):
+                print(f"      LLM error for {species} paper {paper_idx + 1}: {results}")
+                continue
+
+            for trait, (fetched, value, replayed) in results.items():
+                if not fetched or len(answers[trait]) >= max_answers:
                     continue
+                if not replayed:
+                    _log_paper(all_papers_log, species, trait, pmcid)
+                if value not in EMPTY_ANSWERS:
+                    if not replayed:
+                        _log_paper(successful_papers_log, species, trait, pmcid)
+                    answers[trait].append(value)
+            if not pending():
+                break
 
-                # log every paper where full text was successfully retrieved
-                with open(all_papers_log, "a") as f:
-                    f.write(f"{species}\t{trait}\t{pmcid}\n")
-
-                try:
-                    llm_output = extract_trait_from_paper(species, trait, paper_text, trait_desc)
-                    value = parse_llm_output(llm_output, trait)
-
-                    if value not in ("N/A", "[N/A]", ""):
-                        # log successful papers (where LLM extracted a valid answer)
-                        with open(successful_papers_log, "a") as f:
-                            f.write(f"{species}\t{trait}\t{pmcid}\n")
-                        answers.append(value)
-                        if len(answers) >= 3:
-                            break
-                except Exception as e:
-                    print(f"      LLM error for {species} {trait} paper {paper_idx + 1}: {e}")
-
-            # consensus stage
-            if answers:
-                consensus_output = summarize_answers_with_llm(species, trait, answers)
-                final_value = parse_llm_output(consensus_output, trait)
-                results.at[idx, trait] = final_value
-            else:
-                results.at[idx, trait] = ""
-
-            # save results and notify GUI after each trait
-            results.to_csv(output_path, index=False)
-            steps_done += 1
+    return answers
+
+
+async def _consensus(species: str, trait: str, answers: list):
+    if not answers:
+        return ""
+    if LOCAL_CONSENSUS:
+        value = local_consensus(answers)
+        if value is not None:
+            metrics.count("local_consensus")
+            return value
+    with metrics.labels(trait=trait), metrics.stage("consensus"):
+        consensus_output = await summarize_answers_with_llm(species, trait, answers)
+    return parse_llm_output(consensus_output, trait)
+
+
+async def iucn_stage(species: str, traits: list, trait_descriptions: dict = None, store: JobStore = None):
+    """IUCN values of every trait of a species from one cached, pruned assessment and one LLM call.
+
+    Returns {trait: value}; values already recorded in the job store, and traits whose pair
+    already has a result, are not extracted again.
+    """
+    trait_descriptions = trait_descriptions or {}
+    store = store or JobStore(":memory:")
+    values = {}
+    pending = []
+    for trait in traits:
+        store.start_pair(species, trait, trait_descriptions.get(trait, ""))
+        value = store.get_iucn_value(species, trait)
+        if value is not None:
+            values[trait] = value
+        elif store.get_result(species, trait) is None:
+            pending.append(trait)
+    if not pending:
+        return values
+
+    genus, sp = species.split(" ", 1) if " " in species else (species, "")
+    with metrics.labels(species=species), metrics.stage("iucn"):
+        iucn_data = await asyncio.to_thread(get_iucn_assessment, genus, sp)
+        if not iucn_data:  # not assessed (or lookup failed); nothing recorded so a resumed run asks again
+            return {**values, **{trait: "N/A" for trait in pending}}
+        extracted = await extract_traits_from_iucn(species, pending, prune_iucn_assessment(iucn_data), trait_descriptions)
+    for trait in pending:
+        values[trait] = extracted.get(trait, "N/A")
+        store.save_iucn_value(species, trait, values[trait])
+    return values
+
+
+async def _candidates(species: str, trait: str, trait_desc: str, store: JobStore):
+    pmcids = store.get_candidates(species, trait)
+    if pmcids is None:
+        with metrics.labels(trait=trait):
+            pmcids = await asyncio.to_thread(find_candidates, species, trait, trait_desc, 20)
+        store.save_candidates(species, trait, pmcids)
+    return pmcids
+
+
+async def process_pair(species: str, trait: str, trait_desc: str = "", iucn_value: str = None,
+                       all_papers_log: str = None, successful_papers_log: str = None, store: JobStore = None):
+    """Run the literature, extraction and consensus stages for one species-trait pair.
+
+    iucn_value is the pair's value from iucn_stage; the literature is only searched when it is N/A.
+    """
+    store = store or JobStore(":memory:")
+    store.start_pair(species, trait, trait_desc)
+    value = store.get_result(species, trait)
+    if value is not None:  # finished before a restart
+        return value
+
+    print(f"  Processing trait: {species} / {trait}")
+    with metrics.labels(species=species, trait=trait):
+        value = await _process_pair_stages(species, trait, trait_desc, iucn_value, all_papers_log, successful_papers_log, store)
+    store.save_result(species, trait, value)
+    return value
+
+
+async def _process_pair_stages(species, trait, trait_desc, iucn_value, all_papers_log, successful_papers_log, store):
+    # IUCN + LLM PIPELINE (extracted for the whole species by iucn_stage)
+    if iucn_value not in EMPTY_ANSWERS:
+        return iucn_value
+
+    # PUBMED API + LLM PIPELINE
+    pmcids = await _candidates(species, trait, trait_desc, store)
+
+    if not pmcids:
+        print(f"    No papers found for {species} {trait}")
+        return ""
+
+    pmcids = pmcids[:20]  # check up to 20 papers
+    answers = []
+    if ABSTRACT_TIER:
+        found = await collect_abstract_answers(
+            species, trait, pmcids, trait_desc,
+            all_papers_log=all_papers_log, successful_papers_log=successful_papers_log, store=store
+        )
+        answers = list(found.values())
+        pmcids = [pmcid for pmcid in pmcids if pmcid not in found]
+    if len(answers) < 3:  # escalate to full text
+        answers += await collect_paper_answers(
+            species, trait, pmcids, trait_desc, max_answers=3 - len(answers),
+            all_papers_log=all_papers_log, successful_papers_log=successful_papers_log, store=store
+        )
+
+    # consensus stage
+    return await _consensus(species, trait, answers)
+
+
+async def process_species(species: str, traits: list, trait_descriptions: dict = None, iucn_values: dict = None,
+                          all_papers_log: str = None, successful_papers_log: str = None, store: JobStore = None):
+    """Multi-trait mode: search per trait, then read each paper of the pooled results once for all pending traits."""
+    trait_descriptions = trait_descriptions or {}
+    store = store or JobStore(":memory:")
+    values = {}
+
+    for trait in traits:
+        store.start_pair(species, trait, trait_descriptions.get(trait, ""))
+        value = store.get_result(species, trait)
+        if value is not None:  # finished before a restart
+            values[trait] = value
+    pending = [t for t in traits if t not in values]
+
+    # IUCN + LLM PIPELINE (extracted for the whole species by iucn_stage)
+    if iucn_values and pending:
+        for trait in pending:
+            value = iucn_values.get(trait)
+            if value not in EMPTY_ANSWERS:
+                values[trait] = value
+                store.save_result(species, trait, value)
+        pending = [t for t in traits if t not in values]
+    if not pending:
+        return values
+
+    # PUBMED API + LLM PIPELINE: one search per trait, pooled by interleaving the ranked lists
+    searches = await asyncio.gather(*(_candidates(species, trait, trait_descriptions.get(trait, ""), store) for trait in pending))
+    pool = []
+    for rank_group in zip_longest(*(pmcids[:20] for pmcids in searches)):
+        for pmcid in rank_group:
+            if pmcid and pmcid not in pool:
+                pool.append(pmcid)
+    for trait, pmcids in zip(pending, searches):
+        if not pmcids:
+            print(f"    No papers found for {species} {trait}")
+
+    answers = {trait: [] for trait in pending}
+    skip = {trait: set() for trait in pending}
+    if ABSTRACT_TIER:
+        found = await asyncio.gather(*(
+            collect_abstract_answers(species, trait, pmcids[:20], trait_descriptions.get(trait, ""),
+                                     all_papers_log=all_papers_log, successful_papers_log=successful_papers_log, store=store)
+            for trait, pmcids in zip(pending, searches)
+        ))
+        for trait, abstract_values in zip(pending, found):
+            answers[trait] = list(abstract_values.values())
+            skip[trait] = set(abstract_values)
+    if pool and any(len(answers[trait]) < 3 for trait in pending):  # escalate to full text
+        print(f"    Reading up to {len(pool)} papers for {len(pending)} traits")
+        answers = await collect_species_answers(
+            species, pending, pool, trait_descriptions, answers=answers, skip=skip,
+            all_papers_log=all_papers_log, successful_papers_log=successful_papers_log, store=store
+        )
+
+    # consensus stage
+    consensus = await asyncio.gather(*(_consensus(species, trait, answers[trait]) for trait in pending))
+    for trait, value in zip(pending, consensus):
+        values[trait] = value
+        store.save_result(species, trait, value)
+    return values
+
+
+async def _process_all_pairs(species_list: list, traits_list: list, trait_descriptions: dict, sink: ResultSink,
+                             all_papers_log: str, successful_papers_log: str, progress_callback=None,
+                             multi_trait: bool = False, store: JobStore = None, result_callback=None):
+    """Process every species-trait pair with PAIR_CONCURRENCY workers sharing the LLM rate limiter.
+
+    In multi-trait mode a work item is a whole species rather than a single pair.
+    """
+    total_steps = len(species_list) * len(traits_list)
+    steps_done = 0
+    iucn_tasks = {}
+
+    def iucn_for(species):
+        # one IUCN lookup and extraction per species, shared by all of its traits
+        if species not in iucn_tasks:
+            print(f"\nProcessing {species}...")
+            iucn_tasks[species] = asyncio.ensure_future(iucn_stage(species, traits_list, trait_descriptions, store))
+        return iucn_tasks[species]
+
+    # species-major order, so a species' traits run together and share its IUCN lookup
+    if multi_trait:
+        work = ((idx, species, traits_list) for idx, species in enumerate(species_list))
+    else:
+        work = ((idx, species, [trait]) for idx, species in enumerate(species_list) for trait in traits_list)
+
+    async def worker():
+        nonlocal steps_done
+        for idx, species, traits in work:
+            await run_control.checkpoint()
+            try:
+                iucn_values = await iucn_for(species)
+                logs = {"all_papers_log": all_papers_log, "successful_papers_log": successful_papers_log, "store": store}
+                with metrics.labels(species=species):
+                    if multi_trait:
+                        values = await process_species(species, traits, trait_descriptions, iucn_values, **logs)
+                    else:
+                        trait = traits[0]
+                        values = {trait: await process_pair(species, trait, trait_descriptions.get(trait, ""), iucn_values.get(trait), **logs)}
+            except ReplayMiss as e:
+                # left unfinished in the job store, so a later run with the API does the pair for real
+                print(f"    Not in the replay cache, left as N/A: {species} {', '.join(traits)} ({e})")
+                values = {trait: "N/A" for trait in traits}
+            except Exception as e:
+                print(f"    Failed to process {species} {', '.join(traits)}: {e}")
+                values = {trait: "" for trait in traits}
+            # record results and notify GUI after each work item; the output file is rewritten at checkpoints
+            values = {trait: values.get(trait, "") for trait in traits}
+            sink.record(idx, values)
+            if result_callback:
+                result_callback(idx, values)
+            if sink.checkpoint_due():
+                await asyncio.to_thread(sink.checkpoint)
+            steps_done += len(traits)
             if progress_callback:
                 progress_callback(steps_done, total_steps)
 
+    await asyncio.gather(*(worker() for _ in range(max(1, PAIR_CONCURRENCY))))
+
+
+def refresh_search(species: str, trait: str, since: str) -> bool:
+    """Whether Europe PMC has papers on a pair first published since `since` (YYYY-MM-DD).
+
+    If so, the pair's cached search is dropped so extraction sees the new papers.
+    """
+    query = search_query(species, trait)
+    if not search_papers(query, since=since):
+        return False
+    search_cache.invalidate(query)
+    return True
+
+
+def plan_incremental(store: JobStore, species_list: list, traits_list: list, trait_descriptions: dict,
+                     input_values: dict, output_path: str, refresh: bool) -> dict:
+    """Cells an incremental run keeps (see incremental.cells_to_keep), recorded in the job store as finished pairs."""
+    since = last_run_date(store, output_path) if refresh else None
+    kept = cells_to_keep(species_list, traits_list, trait_descriptions, store, input_values or {}, output_path,
+                         (lambda species, trait: refresh_search(species, trait, since)) if since else None)
+    apply_to_store(store, kept, species_list, traits_list, trait_descriptions)
+    print(f"Incremental run: keeping {len(kept)} of {len(species_list) * len(traits_list)} cells"
+          + (f", papers published since {since} checked" if since else ""))
+    return kept
+
+
+def run_paths(output_file: str, log_prefix: str = "") -> tuple:
+    """(output path, all-papers log, successful-papers log) of a run.
+
+    output_file is relative to results/ unless absolute; the paper logs go next to it.
+    """
+    output_path = os.path.join(RESULTS_DIR, output_file)
+    log_dir = os.path.dirname(output_path)
+    os.makedirs(log_dir, exist_ok=True)
+    return (output_path, os.path.join(log_dir, f"{log_prefix}all_papers.txt"),
+            os.path.join(log_dir, f"{log_prefix}successful_papers.txt"))
+
+
+def process_species_traits(species_list: list, traits_list: list, output_file: str, trait_descriptions: dict = None, progress_callback=None,
+                           multi_trait: bool = None, resume: bool = True, batch: bool = None, log_prefix: str = "",
+                           result_callback=None, incremental: bool = None, refresh: bool = None, input_values: dict = None):
+    """Main helper method to process species and traits lists through the pipeline.
+
+    Progress is recorded in results/<output_file>.jobs.sqlite; if a previous run with the same
+    output file did not finish, it is resumed (completed pairs are skipped and half-finished
+    pairs continue from the next unread paper) unless resume=False.
+
+    With batch=True (or BATCH_MODE=1) the run goes through the Batch API instead. log_prefix
+    is prepended to the paper log file names, so several runs can share a directory.
+
+    The output format follows the file extension (.csv, .parquet, .arrow/.feather); the file is
+    rewritten every RESULT_CHECKPOINT_SECONDS and at the end. Returns the output path.
+
+    result_callback(species_index, {trait: value}) is called as each pair (or multi-trait
+    species) finishes. The run can be paused and cancelled through run_control; a cancelled
+    run writes what it has, raises RunCancelled, and resumes from there next time.
+
+    With incremental=True (or INCREMENTAL=1), cells filled in input_values ({(species, trait):
+    value}, e.g. inputs.filled_cells of the species file) or by earlier runs are kept and only
+    new or changed pairs are processed; with refresh=True (or REFRESH_NEW_PAPERS=1) kept pairs
+    are also redone when Europe PMC has papers on them published since the last run.
+    """
+    if incremental is None:
+        incremental = INCREMENTAL
+    if refresh is None:
+        refresh = REFRESH_NEW_PAPERS
+    if batch if batch is not None else BATCH_MODE:
+        from batch_mode import process_species_traits_batch
+        return process_species_traits_batch(species_list, traits_list, output_file, trait_descriptions, progress_callback,
+                                            log_prefix, result_callback, incremental, refresh, input_values)
+    if multi_trait is None:
+        multi_trait = MULTI_TRAIT
+
+    start_time = time.time()
+
+    output_path, all_papers_log, successful_papers_log = run_paths(output_file, log_prefix)
+    sink = ResultSink(output_path, species_list, traits_list)
+
+    store = JobStore(f"{os.path.splitext(output_path)[0]}.jobs.sqlite")
+    if store.begin(resume, keep_finished=incremental):
+        print(f"Resuming unfinished run from {store.path}")
+    elif not incremental:
+        # clear previous logs if they exist
+        open(all_papers_log, "w").close()
+        open(successful_papers_log, "w").close()
+    if incremental:
+        # kept cells become finished pairs, which the pipeline passes through like a resumed run's
+        plan_incremental(store, species_list, traits_list, trait_descriptions or {}, input_values, output_path, refresh)
+    store.save_trait_descriptions(trait_descriptions or {})
+
+    stem = os.path.splitext(output_path)[0]
+    metrics.start_run(f"{stem}.metrics.csv" if METRICS else None)
+    profiler = cProfile.Profile() if PROFILE else None
+    if profiler:
+        profiler.enable()
+    try:
+        asyncio.run(run_control.run(_process_all_pairs(
+            species_list, traits_list, trait_descriptions or {}, sink,
+            all_papers_log, successful_papers_log, progress_callback, multi_trait, store, result_callback
+        )))
+        store.finish()
+    except RunCancelled:
+        print(f"\nRun cancelled; finished pairs are kept in {store.path} and the next run resumes from there")
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(f"{stem}.prof")
+            print(f"Profile written to {stem}.prof (python -m pstats, snakeviz)")
+        sink.checkpoint()
+        sink.close()
+        store.close()
+        pdf_parse_pool.shutdown()
+
     print(f"\nResults written to {output_file}")
 
+    cache_stats = paper_cache.stats()
+    print(f"Paper cache: {cache_stats['hits']['txt'] + cache_stats['hits']['xmltxt']} text hits, "
+          f"{cache_stats['hits']['pdf']} PDF hits, {cache_stats['misses']['pdf'] + cache_stats['misses']['xml']} downloads")
+    if response_cache.enabled:
+        print(f"LLM response cache: {response_cache.hits} hits, {response_cache.misses} misses")
+    if search_cache.enabled:
+        print(f"Search cache: {search_cache.hits} hits, {search_cache.misses} misses")
+    if llm_pool.throttled:
+        print(f"LLM rate limit responses: {llm_pool.throttled}")
+    if len(llm_pool.endpoints) > 1:
+        print(f"LLM endpoints:\n{llm_pool.summary()}")
+    if http_client.stats:
+        print(f"HTTP:\n{http_client.summary()}")
+
     # timing
     end_time = time.time()
     total_time = end_time - start_time
     hours, rem = divmod(total_time, 3600)
     minutes, seconds = divmod(rem, 60)
-    # print(f"\nTotal processing time: {int(hours)}h {int(minutes)}m {seconds:.2f}s")
-
-    return results
+    print(f"\nTotal processing time: {int(hours)}h {int(minutes)}m {seconds:.2f}s")
+
+    total_pairs = len(species_list) * len(traits_list)
+    report = metrics.finish_run(f"{stem}.metrics.json" if METRICS else None, extra={
+        "pairs": total_pairs,
+        "pairs_per_minute": round(total_pairs / total_time * 60, 2) if total_time else 0.0,
+        "paper_cache": cache_stats,
+        "llm_cache": response_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "llm_rate_limit_responses": llm_pool.throttled,
+        "llm_endpoints": {e.name: e.as_dict() for e in llm_pool.endpoints},
+        "pdf_parse_timeouts": pdf_parse_pool.timeouts,
+        "http": {host: s.as_dict() for host, s in http_client.stats.items()},
+    })
+    print(f"LLM tokens: {report['prompt_tokens']} prompt, {report['completion_tokens']} completion")
+    if METRICS:
+        print(f"Run report written to {stem}.metrics.json (per-call timings in {stem}.metrics.csv)")
+
+    return output_path
+
+def _mean_std(counts: list):
+    if not counts:
+        return 0.0, 0.0
+    return sum(counts) / len(counts), statistics.stdev(counts) if len(counts) > 1 else 0.0
+
+
+async def _count_all(pairs: list) -> list:
+    # extraction reads metadata records when screening or reading abstracts, so search for those here
+    search = search_records if PAPER_SCREENING or ABSTRACT_TIER else search_hits
+
+    async def count(species, trait):
+        hits = await asyncio.to_thread(search, search_query(species, trait), 20)
+        if hits is None:
+            print(f"  Search failed for {species} / {trait}")
+            return 0
+        return hits[0]
+
+    # the HTTP client caps concurrent requests per host
+    return await asyncio.gather(*(count(species, trait) for species, trait in pairs))
+
+
+def sanity_check(species_list: list, traits_list: list, log_file: str = "literature_availability_results.txt"):
+    """Literature availability per trait and per species, from Europe PMC hit counts.
+
+    All queries run concurrently and only fetch IDs, or the metadata records too when
+    PAPER_SCREENING or ABSTRACT_TIER is on; the results of each query are kept in the search
+    cache, so the extraction run that follows does not search again. The report is written to
+    log_file (relative to results/ unless absolute).
+    """
+    pairs = [(species, trait) for trait in traits_list for species in species_list]
+    print(f"Checking literature for {len(pairs)} species-trait pairs...")
+    counts = dict(zip(pairs, asyncio.run(run_control.run(_count_all(pairs)))))
 
-def sanity_check(species_list: list, traits_list: list):
-    import statistics
     trait_stats = {}
-    species_counts = {species: [] for species in species_list}
-
     for trait in traits_list:
-        print("Checking trait:", trait)
-
-        for species in species_list:
-            print("  Species:", species)
-            query = f"wild {species} AND {trait}"
-            pmcids = search_papers(query, max_results=20)
-            count = len(pmcids)
-            species_counts[species].append(count)
-
-        counts = [species_counts[s][-1] for s in species_list]  # counts for this trait
-        if counts:
-            mean_count = sum(counts) / len(counts)
-            std_dev = statistics.stdev(counts) if len(counts) > 1 else 0.0
-        else:
-            mean_count = 0.0
-            std_dev = 0.0
-
+        mean_count, std_dev = _mean_std([counts[(s, trait)] for s in species_list])
         trait_stats[trait] = {"mean": mean_count, "std_dev": std_dev}
 
     # compute per-species stats (average across traits)
     species_stats = {}
-    for species, counts in species_counts.items():
-        if counts:
-            mean_count = sum(counts) / len(counts)
-            std_dev = statistics.stdev(counts) if len(counts) > 1 else 0.0
-        else:
-            mean_count = 0.0
-            std_dev = 0.0
+    for species in species_list:
+        mean_count, std_dev = _mean_std([counts[(species, t)] for t in traits_list])
         species_stats[species] = {"mean": mean_count, "std_dev": std_dev}
-    
+
     # write full results to log file
-    results_dir = os.path.join(os.path.dirname(__file__), "..", "results")
-    os.makedirs(results_dir, exist_ok=True)
-    log_path = os.path.join(results_dir, "literature_availability_results.txt")
+    log_path = os.path.join(RESULTS_DIR, log_file)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
     with open(log_path, "w") as f:
         f.write("Sources Found Per Trait:\n")
         for trait, stats in trait_stats.items():
@@ -295,5 +949,8 @@ def sanity_check(species_list: list, traits_list: list):
         f.write("\nSources Found Per Species:\n")
         for species, stats in species_stats.items():
             f.write(f"{species}: {stats['mean']:.1f} +- {stats['std_dev']:.1f} papers\n")
+        f.write("\nSources Found Per Species and Trait:\n")
+        for (species, trait), count in counts.items():
+            f.write(f"{species} / {trait}: {count} papers\n")
 
-    return trait_stats, species_stats
\ No newline at end of file
+    return trait_stats, species_stats
@@ -0,0 +1,127 @@
+import asyncio
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+def parse_duration(value: str) -> float | None:
+    """Parse rate-limit reset durations such as "1s", "6m0s", "59.5ms" or "20" into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(num) * scale[unit] for num, unit in parts)
+
+
+def retry_after_seconds(headers) -> float | None:
+    """Read Retry-After style headers from a response, in seconds."""
+    if headers is None:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute token bucket shared by all LLM calls.
+
+    Callers reserve capacity up front and may push the buckets negative; the returned wait
+    is how long the caller must sleep before its request fits, so waiters are served in
+    reservation order. Limits are refreshed from x-ratelimit-* headers and 429 Retry-After
+    values pause every caller. A limit of 0 disables that dimension.
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm = float(rpm or 0)
+        self.tpm = float(tpm or 0)
+        self._requests = self.rpm
+        self._tokens = self.tpm
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0  # 429 responses seen
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request and `tokens` tokens; return the seconds to wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            waits = [self._blocked_until - now, 0.0]
+            if self.rpm:
+                self._requests -= 1
+                waits.append(-self._requests * 60 / self.rpm)
+            if self.tpm:
+                self._tokens -= min(tokens, self.tpm)  # oversized requests only wait for a full bucket
+                waits.append(-self._tokens * 60 / self.tpm)
+            return max(waits)
+
+    async def acquire(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Adopt the provider's limits and remaining capacity from x-ratelimit-* headers."""
+        if headers is None:
+            return
+        limit_requests = _to_float(headers.get("x-ratelimit-limit-requests"))
+        limit_tokens = _to_float(headers.get("x-ratelimit-limit-tokens"))
+        remaining_requests = _to_float(headers.get("x-ratelimit-remaining-requests"))
+        remaining_tokens = _to_float(headers.get("x-ratelimit-remaining-tokens"))
+        with self._lock:
+            self._refill(time.monotonic())
+            if limit_requests:
+                self.rpm = limit_requests
+            if limit_tokens:
+                self.tpm = limit_tokens
+            # only ever lower local capacity: our bucket already accounts for requests not yet seen by the server
+            if remaining_requests is not None and self.rpm:
+                self._requests = min(self._requests, remaining_requests)
+            if remaining_tokens is not None and self.tpm:
+                self._tokens = min(self._tokens, remaining_tokens)
+
+    def paused(self) -> bool:
+        """Whether callers are held by a 429 pause."""
+        return self._blocked_until > time.monotonic()
+
+    def penalize(self, seconds: float):
+        """Pause all callers for `seconds` after a 429."""
+        with self._lock:
+            self.throttled += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
@@ -0,0 +1,112 @@
+import os
+import csv
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+load_dotenv()
+
+# configuration
+RESULT_CHECKPOINT_SECONDS = float(os.getenv("RESULT_CHECKPOINT_SECONDS", "30"))  # how often the output file is rewritten
+COMPACT_CHUNK_ROWS = 5000  # species rows held in memory while writing the output
+
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+MISSING = "N/A"  # value of cells with no result yet
+
+
+class ResultSink:
+    """Append-only record of per-pair results, compacted into the output table at checkpoints.
+
+    record() appends one row to a SQLite log next to the output file, so saving a result costs
+    the same however large the table is. checkpoint() rewrites the output (CSV, Parquet or Arrow
+    IPC, chosen by extension) from the log in chunks of COMPACT_CHUNK_ROWS species, into a
+    temporary file that then replaces the output atomically; readers never see a partial file.
+    Parquet and Arrow output need pyarrow.
+    """
+
+    def __init__(self, output_path: str, species_list: list, traits_list: list,
+                 checkpoint_seconds: float = RESULT_CHECKPOINT_SECONDS):
+        self.output_path = output_path
+        self.species_list = species_list
+        self.traits_list = traits_list
+        self.checkpoint_seconds = checkpoint_seconds
+        self.format = FORMATS.get(os.path.splitext(output_path)[1].lower())
+        if self.format is None:
+            raise ValueError(f"Unsupported output format {output_path}; use .csv, .parquet, .arrow or .feather")
+        self.log_path = f"{os.path.splitext(output_path)[0]}.results.sqlite"
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+        self._dirty = False
+        self._conn = sqlite3.connect(self.log_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("DROP TABLE IF EXISTS results")  # the job store repopulates it on resume
+        self._conn.execute("CREATE TABLE results (row INTEGER, trait TEXT, value TEXT, PRIMARY KEY (row, trait))")
+
+    def record(self, row: int, values: dict):
+        """Store {trait: value} for species row `row`."""
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                                   [(row, trait, "" if value is None else str(value)) for trait, value in values.items()])
+            self._dirty = True
+
+    def checkpoint_due(self) -> bool:
+        return self._dirty and time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds
+
+    def _chunks(self):
+        """Yield (species rows, {trait: column values}) for consecutive blocks of the table."""
+        for start in range(0, len(self.species_list), COMPACT_CHUNK_ROWS):
+            species = self.species_list[start:start + COMPACT_CHUNK_ROWS]
+            columns = {trait: [MISSING] * len(species) for trait in self.traits_list}
+            with self._lock:
+                rows = self._conn.execute("SELECT row, trait, value FROM results WHERE row >= ? AND row < ?",
+                                          (start, start + len(species))).fetchall()
+            for row, trait, value in rows:
+                if trait in columns:
+                    columns[trait][row - start] = value
+            yield species, columns
+
+    def _write_csv(self, path: str):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Species"] + self.traits_list)
+            for species, columns in self._chunks():
+                writer.writerows(zip(species, *(columns[t] for t in self.traits_list)))
+
+    def _write_arrow(self, path: str):
+        import pyarrow as pa
+        schema = pa.schema([(name, pa.string()) for name in ["Species"] + self.traits_list])
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(path, schema)
+        else:
+            writer = pa.ipc.new_file(path, schema)
+        with writer:
+            for species, columns in self._chunks():
+                arrays = [pa.array(species, pa.string())] + [pa.array(columns[t], pa.string()) for t in self.traits_list]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    def checkpoint(self):
+        """Rewrite the output file from the log, atomically."""
+        with self._compact_lock:
+            self._dirty = False
+            self._last_checkpoint = time.monotonic()
+            tmp_path = f"{self.output_path}.{os.getpid()}.tmp"
+            try:
+                if self.format == "csv":
+                    self._write_csv(tmp_path)
+                else:
+                    self._write_arrow(tmp_path)
+                os.replace(tmp_path, self.output_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def close(self, remove_log: bool = True):
+        with self._lock:
+            self._conn.close()
+        if remove_log:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.log_path + suffix):
+                    os.remove(self.log_path + suffix)
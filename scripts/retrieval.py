@@ -0,0 +1,108 @@
+import math
+import re
+from collections import Counter
+import tiktoken
+
+CHUNK_WORDS = 180  # target chunk size; paragraphs longer than this are split at line breaks
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+HEADING_RE = re.compile(
+    r"^(\d+(\.\d+)*\.?\s*)?(abstract|introduction|background|methods?|materials and methods|study (area|site|species)"
+    r"|results|discussion|conclusions?|acknowledge?ments?|references|literature cited|bibliography"
+    r"|supplementary( material| information)?|appendix|funding|author contributions|conflicts? of interest)\b",
+    re.IGNORECASE,
+)
+SKIP_SECTIONS = ("acknowledg", "references", "literature cited", "bibliography", "funding", "author contributions", "conflict")
+
+STOPWORDS = set("""
+a an and are as at be been but by for from has have in into is it its of on or that the their these this to was were
+which with within without not no than then there also such can may other between per each both all any more most
+return returns only single value values output omit unit units measured use used using options include including
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+def tokenize(text: str) -> list:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def split_into_chunks(text: str, chunk_words: int = CHUNK_WORDS) -> list:
+    """Split paper text into paragraph-sized chunks, dropping reference/acknowledgement sections."""
+    chunks = []
+    current = []
+    current_words = 0
+    skipping = False
+
+    def flush():
+        nonlocal current, current_words
+        if current and not skipping:
+            chunks.append("\n".join(current))
+        current, current_words = [], 0
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            if current_words >= chunk_words // 3:
+                flush()
+            continue
+        heading = len(stripped) < 60 and HEADING_RE.match(stripped)
+        if heading:
+            flush()
+            skipping = heading.group(3).lower().startswith(SKIP_SECTIONS)
+        current.append(stripped)
+        current_words += len(stripped.split())
+        if current_words >= chunk_words:
+            flush()
+    flush()
+    return chunks
+
+
+def bm25_scores(chunks: list, query: str) -> list:
+    """Okapi BM25 score of each chunk against the query, using the chunks themselves as the corpus."""
+    docs = [Counter(tokenize(c)) for c in chunks]
+    if not docs:
+        return []
+    lengths = [sum(d.values()) for d in docs]
+    avg_len = (sum(lengths) / len(lengths)) or 1.0
+    n = len(docs)
+    query_terms = Counter(tokenize(query))
+    idf = {}
+    for term in query_terms:
+        df = sum(1 for d in docs if term in d)
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term, q_weight in query_terms.items():
+            tf = doc.get(term, 0)
+            if not tf:
+                continue
+            score += q_weight * idf[term] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len))
+        scores.append(score)
+    return scores
+
+
+def select_relevant_text(text: str, query: str, token_budget: int, top_k: int = 20) -> str:
+    """Return the best-scoring chunks (at most top_k, within token_budget) in their original order."""
+    chunks = split_into_chunks(text)
+    if not chunks:
+        return ""
+    scores = bm25_scores(chunks, query)
+
+    # use generic encoding to avoid crashing on unknown model names from other providers
+    encoding = tiktoken.get_encoding("cl100k_base")
+    chosen = []
+    used = 0
+    for idx in sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True):
+        if len(chosen) >= top_k or (chosen and scores[idx] <= 0):
+            break
+        size = len(encoding.encode(chunks[idx]))
+        if used + size > token_budget:
+            continue
+        chosen.append(idx)
+        used += size
+
+    return "\n[...]\n".join(chunks[i] for i in sorted(chosen))
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+
+class RunCancelled(BaseException):
+    """Raised inside the pipeline once a run has been cancelled.
+
+    A BaseException, like asyncio.CancelledError, so the pipeline's `except Exception`
+    handlers do not record a cancelled paper or pair as finished.
+    """
+
+
+class RunControl:
+    """Pause, resume and cancel for the running pipeline, callable from any thread (e.g. the GUI).
+
+    Pausing holds new work items, downloads and LLM requests at their next checkpoint while
+    calls already in flight finish. Cancelling cancels the pipeline's asyncio task, which
+    aborts pending LLM requests at once, and stops HTTP calls on worker threads before their
+    next attempt or retry. Call reset() before starting a run that can be controlled.
+    """
+
+    POLL_SECONDS = 0.2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._cancelled = threading.Event()
+        self._loop = None
+        self._task = None
+        self.reset()
+
+    def reset(self):
+        self._cancelled.clear()
+        self._running.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set() and not self.cancelled
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # wake anything waiting out a pause
+        with self._lock:
+            loop, task = self._loop, self._task
+        if task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+
+    def check(self):
+        if self.cancelled:
+            raise RunCancelled()
+
+    # worker threads
+
+    def wait(self):
+        """Block while paused; raise RunCancelled if the run was cancelled."""
+        while not self._running.wait(self.POLL_SECONDS):
+            pass
+        self.check()
+
+    def sleep(self, seconds: float):
+        """time.sleep that ends early, with RunCancelled, when the run is cancelled."""
+        self._cancelled.wait(seconds)
+        self.check()
+
+    # event loop
+
+    async def checkpoint(self):
+        """Wait while paused; raise RunCancelled if the run was cancelled."""
+        while not self._running.is_set():
+            await asyncio.sleep(self.POLL_SECONDS)
+        self.check()
+
+    async def run(self, coro):
+        """Await the pipeline's top-level coroutine so cancel() can cancel it from another thread."""
+        with self._lock:
+            self._loop, self._task = asyncio.get_running_loop(), asyncio.current_task()
+        try:
+            self.check()
+            return await coro
+        except asyncio.CancelledError:
+            if self.cancelled:
+                raise RunCancelled() from None
+            raise
+        finally:
+            with self._lock:
+                self._loop = self._task = None
+            coro.close()  # never awaited if the run was cancelled before it started
+
+
+run_control = RunControl()
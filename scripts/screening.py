@@ -0,0 +1,89 @@
+import os
+import re
+import math
+from dotenv import load_dotenv
+from retrieval import tokenize
+load_dotenv()
+
+# configuration
+PAPER_SCREENING = os.getenv("PAPER_SCREENING", "1") == "1"  # rank and filter candidates by search metadata before download
+
+# score weights
+SPECIES_IN_TITLE = 4.0
+SPECIES_IN_ABSTRACT = 3.0
+SPECIES_IN_TERMS = 2.0  # keywords and MeSH headings
+GENUS_ONLY = 1.0
+TRAIT_TERMS = 2.0  # times the fraction of trait-name terms found
+DESCRIPTION_TERMS = 1.0  # times the fraction of trait-description terms found
+FULL_TEXT = 1.0  # open access (JATS full text available)
+HAS_PDF = 0.5
+CITATIONS = 1.0  # times log10(1 + citations) / 3, capped at 1
+
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _name_pattern(name: str) -> re.Pattern | None:
+    """Matches "Genus species" and "G. species" (any spacing and case)."""
+    words = name.split()
+    if len(words) < 2:
+        return None
+    genus, epithet = re.escape(words[0]), re.escape(words[1])
+    return re.compile(rf"\b(?:{genus}|{re.escape(words[0][0])}\.)\s*{epithet}\b", re.IGNORECASE)
+
+
+def score_record(record: dict, species: str, trait: str, trait_desc: str = "", synonyms: list = ()) -> tuple:
+    """(score, whether the species or its genus is mentioned) of one search result from its metadata."""
+    title = TAG_RE.sub(" ", record.get("title") or "")
+    abstract = TAG_RE.sub(" ", record.get("abstract") or "")
+    terms = " ; ".join((record.get("keywords") or []) + (record.get("mesh") or []))
+    patterns = [p for p in (_name_pattern(name) for name in [species, *synonyms]) if p]
+
+    def names_in(text):
+        return any(p.search(text) for p in patterns)
+
+    score = 0.0
+    if names_in(title):
+        score += SPECIES_IN_TITLE
+    if names_in(abstract):
+        score += SPECIES_IN_ABSTRACT
+    if names_in(terms):
+        score += SPECIES_IN_TERMS
+    mentioned = score > 0
+    if not mentioned:
+        genera = {name.split()[0] for name in [species, *synonyms] if name.split()}
+        if any(re.search(rf"\b{re.escape(g)}\b", f"{title} {abstract} {terms}", re.IGNORECASE) for g in genera):
+            score += GENUS_ONLY
+            mentioned = True
+
+    words = set(tokenize(f"{title} {abstract} {terms}"))
+    trait_terms = set(tokenize(trait))
+    desc_terms = set(tokenize(trait_desc)) - trait_terms
+    if trait_terms:
+        score += TRAIT_TERMS * len(trait_terms & words) / len(trait_terms)
+    if desc_terms:
+        score += DESCRIPTION_TERMS * len(desc_terms & words) / len(desc_terms)
+
+    if record.get("open_access"):
+        score += FULL_TEXT
+    if record.get("has_pdf"):
+        score += HAS_PDF
+    score += CITATIONS * min(1.0, math.log10(1 + (record.get("cited_by") or 0)) / 3)
+    return score, mentioned
+
+
+def screen_records(records: list, species: str, trait: str, trait_desc: str = "", synonyms: list = ()) -> list:
+    """PMCIDs worth downloading, best first, from the metadata records of a search.
+
+    A paper is dropped when its title and abstract are known and name neither the species, a
+    synonym nor the genus, or when neither full text nor a PDF is available. The rest are
+    ordered by score_record, ties keeping the search engine's relevance order.
+    """
+    ranked = []
+    for rank, record in enumerate(records):
+        score, mentioned = score_record(record, species, trait, trait_desc, synonyms)
+        if not mentioned and record.get("abstract"):
+            continue
+        if not (record.get("open_access") or record.get("has_pdf") or record.get("in_epmc")):
+            continue
+        ranked.append((-score, rank, record["pmcid"]))
+    return [pmcid for _, _, pmcid in sorted(ranked)]
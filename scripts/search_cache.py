@@ -0,0 +1,88 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+load_dotenv()
+
+# configuration
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", os.path.join(os.path.dirname(__file__), "..", "cache", "searches.sqlite"))
+SEARCH_CACHE_DAYS = float(os.getenv("SEARCH_CACHE_DAYS", "7"))  # 0 disables the cache
+
+
+class SearchCache:
+    """SQLite cache of Europe PMC search results: total hit count and top PMCIDs per query.
+
+    The availability check fills it and the extraction run reads from it, so each query is sent
+    once. Searches made for screening also store the papers' metadata records. Entries older
+    than ttl_seconds are searched again, since new papers keep appearing.
+    """
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH, ttl_seconds: float = SEARCH_CACHE_DAYS * 86400):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def _connection(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS searches ("
+                "query TEXT, page_size INTEGER, hit_count INTEGER, pmcids TEXT, created REAL, records TEXT, "
+                "PRIMARY KEY (query, page_size))"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(searches)")]
+            if "records" not in columns:  # cache written before metadata records were stored
+                self._conn.execute("ALTER TABLE searches ADD COLUMN records TEXT")
+        return self._conn
+
+    def get(self, query: str, page_size: int, records: bool = False) -> tuple | None:
+        """(hit_count, pmcids) for a fresh cached search, else None.
+
+        With records=True, (hit_count, metadata records) instead, and None if the search was
+        cached without them.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT hit_count, pmcids, created, records FROM searches WHERE query = ? AND page_size = ?", (query, page_size)
+            ).fetchone()
+            if row and time.time() - row[2] <= self.ttl_seconds and (row[3] is not None or not records):
+                self.hits += 1
+                return row[0], json.loads(row[3] if records else row[1])
+            self.misses += 1
+        return None
+
+    def put(self, query: str, page_size: int, hit_count: int, pmcids: list, records: list = None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO searches (query, page_size, hit_count, pmcids, created, records) VALUES (?, ?, ?, ?, ?, ?)",
+                (query, page_size, hit_count, json.dumps(pmcids), time.time(), None if records is None else json.dumps(records))
+            )
+
+    def invalidate(self, query: str):
+        """Drop every cached page size of a query, so it is searched again."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._connection().execute("DELETE FROM searches WHERE query = ?", (query,))
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+search_cache = SearchCache()
@@ -1,17 +1,19 @@
 import sys
 import os
-import pandas as pd
 
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QLabel, QPushButton, QVBoxLayout,
+    QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
     QMessageBox, QFileDialog,
-    QTabWidget,
+    QTabWidget, QTableWidget, QTableWidgetItem, QAbstractItemView,
     QSpacerItem, QSizePolicy, QScrollArea, QProgressBar
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QRect
 from PyQt5.QtGui import QPixmap, QFont, QPainter, QColor
 from PyQt5.QtWidgets import QStyleOptionProgressBar, QStyle
 from pubmed_query import process_species_traits, sanity_check
+from inputs import load_species_table, load_trait_descriptions, filled_cells
+from metrics import metrics
+from run_control import run_control, RunCancelled
 
 
 class SanityCheckWorker(QThread):
@@ -23,27 +25,39 @@ class SanityCheckWorker(QThread):
         self.traits_list = traits_list
 
     def run(self):
-        results = sanity_check(self.species_list, self.traits_list)
+        try:
+            results = sanity_check(self.species_list, self.traits_list)
+        except RunCancelled:  # window closed
+            return
         self.finished.emit(results)
 
 
 class ExtractionWorker(QThread):
     finished = pyqtSignal(str)
+    cancelled = pyqtSignal(str)
     progress = pyqtSignal(int, int)
+    result = pyqtSignal(int, object)  # species row, {trait: value}
 
-    def __init__(self, species_list, traits_list, trait_descriptions, file_name):
+    def __init__(self, species_list, traits_list, trait_descriptions, file_name, input_values=None):
         super().__init__()
         self.species_list = species_list
         self.traits_list = traits_list
         self.trait_descriptions = trait_descriptions
         self.file_name = file_name
+        self.input_values = input_values
 
     def run(self):
-        process_species_traits(
-            self.species_list, self.traits_list,
-            self.file_name, self.trait_descriptions,
-            progress_callback=lambda done, total: self.progress.emit(done, total)
-        )
+        try:
+            process_species_traits(
+                self.species_list, self.traits_list,
+                self.file_name, self.trait_descriptions,
+                progress_callback=lambda done, total: self.progress.emit(done, total),
+                result_callback=lambda row, values: self.result.emit(row, values),
+                input_values=self.input_values
+            )
+        except RunCancelled:
+            self.cancelled.emit(self.file_name)
+            return
         self.finished.emit(self.file_name)
 
 
@@ -103,6 +117,7 @@ class SpeciesTraitsApp(QWidget):
         self.species_list = []
         self.traits_list = []
         self.trait_descriptions = {}
+        self.input_values = {}
         self.output_file_name = "output_results.csv"
 
         self.layout = QVBoxLayout()
@@ -287,6 +302,7 @@ class SpeciesTraitsApp(QWidget):
     
     def run_sanity_check(self):
         self.show_sanity_loading()
+        run_control.reset()
         self.sanity_worker = SanityCheckWorker(self.species_list, self.traits_list)
         self.sanity_worker.finished.connect(self.on_sanity_check_finished)
         self.sanity_worker.start()
@@ -300,10 +316,13 @@ class SpeciesTraitsApp(QWidget):
 
         self.worker = ExtractionWorker(
             self.species_list, self.traits_list,
-            self.trait_descriptions, self.output_file_name
+            self.trait_descriptions, self.output_file_name, self.input_values
         )
-        self.worker.progress.connect(lambda done, total: self.progress_bar.setValue(done))
+        self.worker.progress.connect(self.on_progress)
+        self.worker.result.connect(self.on_result)
         self.worker.finished.connect(self.on_extraction_finished)
+        self.worker.cancelled.connect(self.on_extraction_cancelled)
+        run_control.reset()
         self.worker.start()
 
     def show_loading(self, total_species, total_traits):
@@ -331,7 +350,83 @@ class SpeciesTraitsApp(QWidget):
         self.progress_bar.setFixedHeight(28)
         layout.addWidget(self.progress_bar)
 
+        self.throughput_label = QLabel("")
+        self.throughput_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.throughput_label)
+
+        # results grid, filled in as each species-trait pair finishes
+        self.results_table = QTableWidget(total_species, total_traits)
+        self.results_table.setHorizontalHeaderLabels(self.traits_list)
+        self.results_table.setVerticalHeaderLabels(self.species_list)
+        self.results_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_table.setMinimumHeight(250)
+        layout.addWidget(self.results_table)
+
+        btn_layout = QHBoxLayout()
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.clicked.connect(self.toggle_pause)
+        btn_layout.addWidget(self.pause_button)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_extraction)
+        btn_layout.addWidget(self.cancel_button)
+        layout.addLayout(btn_layout)
+
         self.layout.addWidget(container)
+        self.resize(max(self.width(), 800), max(self.height(), 650))
+
+    def on_progress(self, done, total):
+        self.progress_bar.setValue(done)
+        if not run_control.paused and not run_control.cancelled:
+            self.throughput_label.setText(metrics.progress_text(done, total))
+
+    def on_result(self, row, values):
+        for trait, value in values.items():
+            item = QTableWidgetItem(value or "N/A")
+            self.results_table.setItem(row, self.traits_list.index(trait), item)
+        if values:
+            self.results_table.scrollToItem(item)
+
+    def toggle_pause(self):
+        if run_control.paused:
+            run_control.resume()
+            self.pause_button.setText("Pause")
+            self.throughput_label.setText("")
+        else:
+            run_control.pause()
+            self.pause_button.setText("Resume")
+            self.throughput_label.setText("Paused; requests already sent are finishing.")
+
+    def cancel_extraction(self):
+        answer = QMessageBox.question(
+            self, "Cancel Extraction",
+            "Stop the run now? Finished results are saved, and starting again with the same files resumes it."
+        )
+        if answer != QMessageBox.Yes:
+            return
+        run_control.cancel()
+        self.pause_button.setEnabled(False)
+        self.cancel_button.setEnabled(False)
+        self.throughput_label.setText("Cancelling...")
+
+    def show_cancelled(self, file_name):
+        self.clear_layout()
+        self.layout.addWidget(QLabel(
+            f"Extraction cancelled. Results so far saved as {file_name}.\n"
+            "Start again with the same files to resume where it stopped."
+        ))
+        done_button = QPushButton("Done")
+        done_button.clicked.connect(self.close)
+        self.layout.addWidget(done_button)
+
+    def closeEvent(self, event):
+        # stop any running pipeline instead of leaving it spending API quota in the background
+        workers = [w for w in (getattr(self, "worker", None), getattr(self, "sanity_worker", None)) if w and w.isRunning()]
+        if workers:
+            self.setWindowTitle("Stopping...")
+            run_control.cancel()
+            for worker in workers:
+                worker.wait()
+        event.accept()
 
     def show_success(self, file_name):
         self.clear_layout()
@@ -361,35 +456,15 @@ class SpeciesTraitsApp(QWidget):
             QMessageBox.critical(self, "Error", "Please select both Species and Trait Description files.")
             return
 
-        # parse input file (Excel or CSV)
-        if self.species_path.lower().endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(self.species_path)
-        elif self.species_path.lower().endswith('.csv'):
-            df = pd.read_csv(self.species_path)
-        else:
-            QMessageBox.critical(self, "Error", "Unsupported file type. Please upload an Excel or CSV file.")
+        # parse input file (Excel or CSV) and trait description file
+        try:
+            species_list, self.traits_list = load_species_table(self.species_path)
+            self.input_values = filled_cells(self.species_path)  # kept as they are in incremental mode
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
             return
+        self.trait_descriptions = load_trait_descriptions(self.traits_path, self.traits_list)
 
-        species_list = df.iloc[:, 0].dropna().astype(str).tolist()  # first col = species
-        raw_traits_list = df.columns[1:].astype(str).tolist()  # rest = traits
-
-        # parse trait description file
-        parsed_descriptions = {}
-        with open(self.traits_path, "r") as f: # utf 8
-            for line in f:
-                if ":" in line:
-                    trait, desc = line.split(":", 1)
-                    clean_trait = trait.strip().lower().lstrip("\ufeff") # remove BOM if exists
-                    parsed_descriptions[clean_trait] = desc.strip()
-
-        # normalize traits and map descriptions (case-insensitive)
-        self.traits_list = []
-        self.trait_descriptions = {}
-        for t in raw_traits_list:
-            self.traits_list.append(t)
-            t_lower = t.strip().lower()
-            self.trait_descriptions[t] = parsed_descriptions.get(t_lower, "")
-        
         self.species_list = species_list
         self.output_file_name = "output_results.csv"
 
@@ -398,6 +473,9 @@ class SpeciesTraitsApp(QWidget):
     def on_extraction_finished(self, file_name):
         self.show_success(file_name)
 
+    def on_extraction_cancelled(self, file_name):
+        self.show_cancelled(file_name)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = SpeciesTraitsApp()
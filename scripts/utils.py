@@ -1,79 +1,347 @@
 import os
+import re
+import json
+import time
+import html
+import asyncio
+import tempfile
+import threading
+import contextlib
 import requests
-import io
-import pdfplumber
 from dotenv import load_dotenv
+from paper_cache import paper_cache, PaperCache
+from search_cache import search_cache
+from metrics import metrics
+from http_client import http_client
+from pdf_pool import pdf_parse_pool
+from jats import jats_to_text
+from run_control import run_control
 load_dotenv()
 
 IUCN_API_KEY = os.getenv("IUCN_API_KEY")
-TAXA_API_URL = "https://api.iucnredlist.org/api/v4/taxa/scientific_name"
-ASSESSMENT_API_URL = "https://api.iucnredlist.org/api/v4/assessment"
-BASE_URL = "https://www.ebi.ac.uk/europepmc/webservices/rest"
-PDF_URL = "https://europepmc.org/backend/ptpmcrender.fcgi"
+IUCN_API_URL = os.getenv("IUCN_API_URL", "https://api.iucnredlist.org/api/v4")  # overridable for mirrors and benchmarks
+TAXA_API_URL = f"{IUCN_API_URL}/taxa/scientific_name"
+ASSESSMENT_API_URL = f"{IUCN_API_URL}/assessment"
+BASE_URL = os.getenv("EUROPEPMC_API_URL", "https://www.ebi.ac.uk/europepmc/webservices/rest")
+PDF_URL = os.getenv("EUROPEPMC_PDF_URL", "https://europepmc.org/backend/ptpmcrender.fcgi")
+PAPER_SOURCE = os.getenv("PAPER_SOURCE", "xml").lower()  # "xml": JATS full text, PDF fallback; "pdf": PDF only
+PDF_MAX_MB = float(os.getenv("PDF_MAX_MB", "100"))  # larger PDFs are skipped; 0 = no limit
+PDF_CHUNK_BYTES = 1024 * 1024
+IUCN_CACHE_DIR = os.getenv("IUCN_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "cache", "iucn"))
+IUCN_CACHE_DAYS = float(os.getenv("IUCN_CACHE_DAYS", "90"))  # refetch assessments older than this; 0 never expires
+
+# assessment sections that can hold trait information; references, credits, locations etc. are dropped
+IUCN_SECTIONS = ("red_list_category", "population_trend", "systems", "habitats", "threats", "supplementary_info", "documentation")
+IUCN_DROP_KEYS = {"code", "links", "url", "sis_code", "assessment_id", "latest"}
+
+iucn_cache = PaperCache(IUCN_CACHE_DIR, 256 * 1024 * 1024)
+_iucn_locks = {}  # one lock per taxon, so concurrent callers wait for a single fetch
+_iucn_locks_guard = threading.Lock()
 
 def _iucn_headers():
     return {"Authorization": IUCN_API_KEY or "", "accept": "application/json"}
 
-def get_iucn_assessment_id(genus: str, species: str) -> str | None:
-    """Get latest assessment_id for species, else None."""
-    url = f"{TAXA_API_URL}?genus_name={genus}&species_name={species}"
+def _iucn_synonyms(taxon: dict) -> list:
+    names = []
+    for synonym in taxon.get("synonyms") or []:
+        name = synonym.get("name") or f"{synonym.get('genus_name', '')} {synonym.get('species_name', '')}".strip()
+        if name:
+            names.append(name)
+    return names
+
+def _iucn_lookup(genus: str, species: str) -> tuple:
+    """(latest assessment_id or None, synonyms, whether the answer is definitive rather than a failed request)."""
+    params = {"genus_name": genus, "species_name": species}
     try:
-        r = requests.get(url, headers=_iucn_headers(), timeout=30)
-        print(r)
+        r = http_client.get(TAXA_API_URL, params=params, headers=_iucn_headers(), timeout=30)
         if r.status_code != 200:
-            return None
+            if r.status_code != 404:
+                print(f"    IUCN taxa lookup failed for {genus} {species}: HTTP {r.status_code}")
+            return None, [], r.status_code == 404
         data = r.json()
         assessments = data.get("assessments", [])
         latest = next((a for a in assessments if a.get("latest")), None)
-        return latest.get("assessment_id") if latest else None
-    except requests.RequestException:
-        return None
+        return (latest.get("assessment_id") if latest else None), _iucn_synonyms(data.get("taxon") or {}), True
+    except (requests.RequestException, ValueError):
+        return None, [], False
 
-def get_iucn_assessment(genus: str, species: str) -> dict | None:
-    """Get full IUCN assessment JSON for species, else None."""
-    aid = get_iucn_assessment_id(genus, species)
+def _fetch_iucn_assessment(genus: str, species: str) -> tuple:
+    aid, synonyms, definitive = _iucn_lookup(genus, species)
     if not aid:
-        return None
+        return None, synonyms, definitive
     try:
-        r = requests.get(f"{ASSESSMENT_API_URL}/{aid}", headers=_iucn_headers(), timeout=30)
-        return r.json() if r.status_code == 200 else None
-    except requests.RequestException:
-        return None
+        r = http_client.get(f"{ASSESSMENT_API_URL}/{aid}", headers=_iucn_headers(), timeout=30)
+        if r.status_code != 200:
+            print(f"    IUCN assessment {aid} failed: HTTP {r.status_code}")
+            return None, synonyms, False
+        return r.json(), synonyms, True
+    except (requests.RequestException, ValueError):
+        return None, synonyms, False
+
+def _iucn_entry(genus: str, species: str) -> dict:
+    """{"fetched", "assessment", "synonyms"} for a taxon, from the disk cache or the IUCN API."""
+    if not IUCN_API_KEY:
+        return {"assessment": None, "synonyms": []}
+    taxon = f"{genus} {species}".strip().lower()
+    with _iucn_locks_guard:
+        lock = _iucn_locks.setdefault(taxon, threading.Lock())
+    with lock:
+        cached = iucn_cache.get(taxon, "iucn")
+        if cached is not None:
+            entry = json.loads(cached)
+            if not IUCN_CACHE_DAYS or time.time() - entry["fetched"] < IUCN_CACHE_DAYS * 86400:
+                return entry
+
+        assessment, synonyms, definitive = _fetch_iucn_assessment(genus, species)
+        entry = {"fetched": time.time(), "assessment": assessment, "synonyms": synonyms}
+        if definitive:
+            iucn_cache.put(taxon, "iucn", json.dumps(entry).encode("utf-8"))
+        return entry
+
+def get_iucn_assessment(genus: str, species: str) -> dict | None:
+    """Get full IUCN assessment JSON for species, else None.
+
+    Assessments (and "not assessed" answers) are cached on disk per taxon for IUCN_CACHE_DAYS;
+    failed requests are not cached.
+    """
+    return _iucn_entry(genus, species)["assessment"]
+
+def get_iucn_synonyms(genus: str, species: str) -> list:
+    """Scientific names IUCN lists as synonyms of the species (shares the assessment cache)."""
+    return _iucn_entry(genus, species).get("synonyms") or []
 
-def search_papers(query: str, max_results: int = 20):
-    """Search Europe PMC and return a list of PMCIDs (metadata only)."""
+def _prune(value):
+    """Drop empty values and bookkeeping keys, and strip HTML markup from text."""
+    if isinstance(value, dict):
+        pruned = {k: _prune(v) for k, v in value.items() if k not in IUCN_DROP_KEYS}
+        return {k: v for k, v in pruned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [v for v in (_prune(v) for v in value) if v not in (None, "", [], {})]
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", html.unescape(re.sub(r"<[^>]+>", " ", value))).strip()
+    return value
+
+def prune_iucn_assessment(assessment: dict) -> dict:
+    """Keep only the assessment sections that can hold trait information (see IUCN_SECTIONS)."""
+    return _prune({key: assessment[key] for key in IUCN_SECTIONS if key in assessment})
+
+def _core_record(article: dict) -> dict:
+    """The metadata of a resultType=core search result that paper screening looks at."""
+    mesh = (article.get("meshHeadingList") or {}).get("meshHeading") or []
+    return {
+        "pmcid": article.get("pmcid"),
+        "title": article.get("title") or "",
+        "abstract": article.get("abstractText") or "",
+        "keywords": (article.get("keywordList") or {}).get("keyword") or [],
+        "mesh": [heading["descriptorName"] for heading in mesh if heading.get("descriptorName")],
+        "cited_by": int(article.get("citedByCount") or 0),
+        "open_access": article.get("isOpenAccess") == "Y",
+        "has_pdf": article.get("hasPDF") == "Y",
+        "in_epmc": article.get("inEPMC") == "Y",
+    }
+
+def _search(query: str, max_results: int, core: bool) -> tuple | None:
+    """Run a search and cache it; (hit_count, pmcids, metadata records or None), else None on failure."""
     search_url = f"{BASE_URL}/search"
-    params = {"query": query, "resultType": "core", "format": "json", "pageSize": max_results}
+    params = {"query": query, "resultType": "core" if core else "idlist", "format": "json", "pageSize": max_results}
     try:
-        resp = requests.get(search_url, params=params, timeout=30)
-        resp.raise_for_status()
-    except requests.RequestException as e:
+        with metrics.stage("search"):
+            resp = http_client.get(search_url, params=params, timeout=30)
+            resp.raise_for_status()
+            data = resp.json()
+    except (requests.RequestException, ValueError) as e:
         print(f"      EuropePMC error: {e}")
-        return []
+        return None
+
+    results = [article for article in (data.get("resultList") or {}).get("result") or [] if article.get("pmcid")]
+    pmcids = [article["pmcid"] for article in results]
+    records = [_core_record(article) for article in results] if core else None
+    hit_count = int(data.get("hitCount") or 0)
+    search_cache.put(query, max_results, hit_count, pmcids, records)
+    return hit_count, pmcids, records
+
+def search_hits(query: str, max_results: int = 20) -> tuple | None:
+    """Total Europe PMC hit count and the top PMCIDs for a query, else None if the search failed.
+
+    Uses resultType=idlist (IDs only, same relevance order as the full records) and the search
+    cache, so a query checked for availability is not sent again for unscreened extraction.
+    """
+    cached = search_cache.get(query, max_results)
+    if cached is not None:
+        return cached
+    result = _search(query, max_results, core=False)
+    return result[:2] if result else None
+
+def search_records(query: str, max_results: int = 20) -> tuple | None:
+    """(hit_count, metadata records) of the top results for a query, else None if the search failed.
+
+    Records hold the PMCID, title, abstract, keywords, MeSH terms, citation count and
+    open-access / PDF flags (resultType=core), in relevance order.
+    """
+    cached = search_cache.get(query, max_results, records=True)
+    if cached is not None:
+        return cached
+    result = _search(query, max_results, core=True)
+    return (result[0], result[2]) if result else None
+
+
+def search_papers(query: str, max_results: int = 20, since: str = None):
+    """Search Europe PMC and return a list of PMCIDs (IDs only).
+
+    With since (YYYY-MM-DD), only papers first published on or after that date.
+    """
+    if since:
+        query = f"({query}) AND FIRST_PDATE:[{since} TO {time.strftime('%Y-%m-%d')}]"
+    hits = search_hits(query, max_results)
+    return hits[1] if hits else []
+
 
-    data = resp.json()
-    if "resultList" not in data or "result" not in data["resultList"]:
-        return []
+def _discard(path: str):
+    with contextlib.suppress(OSError):
+        os.remove(path)
 
-    pmcids = [article.get("pmcid") for article in data["resultList"]["result"] if article.get("pmcid")]
-    return pmcids
 
+def _spool_pdf(pmcid: str, response, path: str) -> bool:
+    """Stream a PDF response into the file at path; False if it is not a PDF or is larger than PDF_MAX_MB."""
+    if response.status_code != 200 or response.headers.get("Content-Type") != "application/pdf":
+        return False
+    max_bytes = int(PDF_MAX_MB * 1024 * 1024)
+    length = int(response.headers.get("Content-Length") or 0)
+    if max_bytes and length > max_bytes:
+        print(f"      Skipping PDF {pmcid}: {length / 1024 / 1024:.1f} MB is over PDF_MAX_MB")
+        return False
+    size = 0
+    with open(path, "wb") as f:
+        for chunk in response.iter_content(PDF_CHUNK_BYTES):
+            run_control.check()
+            size += len(chunk)
+            if max_bytes and size > max_bytes:  # no or wrong Content-Length
+                print(f"      Skipping PDF {pmcid}: over PDF_MAX_MB")
+                return False
+            f.write(chunk)
+    return True
 
-def fetch_pdf(pmcid: str):
-    """Download and parse a single PDF by PMCID."""
+
+def download_pdf(pmcid: str) -> str | None:
+    """Download the PDF for a PMCID (from the paper cache when possible) to a temporary file.
+
+    Returns the file's path, which the caller deletes, or None. The download is streamed to
+    disk, so a PDF is never held in memory, and abandoned once it exceeds PDF_MAX_MB.
+    """
+    fd, path = tempfile.mkstemp(prefix="trait_pdf_", suffix=".pdf")
+    os.close(fd)
+    if paper_cache.get_pdf_file(pmcid, path):
+        return path
     pdf_url = f"{PDF_URL}?accid={pmcid}&blobtype=pdf"
     try:
-        pdf_resp = requests.get(pdf_url, timeout=30)
-        if pdf_resp.status_code == 200 and pdf_resp.headers.get("Content-Type") == "application/pdf":
-            with pdfplumber.open(io.BytesIO(pdf_resp.content)) as pdf:
-                text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-            if text.strip():
-                print(f"     Retrieved PDF {pmcid}")
-                return text
+        with metrics.stage("download"):
+            with http_client.get(pdf_url, timeout=30, conditional=False, stream=True) as pdf_resp:
+                complete = _spool_pdf(pmcid, pdf_resp, path)
+    except requests.RequestException as e:
+        print(f"      Failed to fetch PDF {pmcid}: {e}")
+        complete = False
+    except BaseException:
+        _discard(path)
+        raise
+    if not complete:
+        _discard(path)
+        return None
+    paper_cache.put_pdf_file(pmcid, path)
+    return path
+
+
+async def _download_pdf_async(pmcid: str) -> str | None:
+    """download_pdf on a thread. If the caller is cancelled meanwhile, the file is deleted once the download ends."""
+    lock = threading.Lock()
+    state = {"abandoned": False, "path": None}
+
+    def download():
+        path = download_pdf(pmcid)
+        with lock:
+            if state["abandoned"] and path:
+                _discard(path)
+                return None
+            state["path"] = path
+        return path
+
+    try:
+        return await asyncio.to_thread(download)
+    except asyncio.CancelledError:
+        with lock:
+            state["abandoned"] = True
+            path = state["path"]
+        if path:
+            _discard(path)
+        raise
+
+
+async def fetch_pdf_async(pmcid: str):
+    """Download and parse a single PDF by PMCID, using the local paper cache when possible.
+
+    The download runs on a thread and parsing in the PDF process pool.
+    """
+    text = paper_cache.get_text(pmcid)
+    if text is not None:
+        return text if text.strip() else None
+
+    path = await _download_pdf_async(pmcid)
+    if path is None:
+        return None
+    try:
+        with metrics.stage("parse"):
+            text = await pdf_parse_pool.parse(path, pmcid)
+    finally:
+        _discard(path)
+    if text is None:  # timed out or crashed; not cached so a later run can retry
+        return None
+    paper_cache.put_text(pmcid, text)
+    if text.strip():
+        print(f"     Retrieved PDF {pmcid}")
+        return text
+    return None
+
+def fetch_fulltext_xml(pmcid: str):
+    """Download Europe PMC JATS full-text XML for an open-access PMCID and convert it to sectioned text."""
+    text = paper_cache.get_xml_text(pmcid)
+    if text is not None:
+        return text or None  # empty entry: no XML available for this paper
+
+    xml_bytes = paper_cache.get(pmcid, "xml")
+    try:
+        if xml_bytes is None:
+            with metrics.stage("download"):
+                resp = http_client.get(f"{BASE_URL}/{pmcid}/fullTextXML", timeout=30, conditional=False)
+            if resp.status_code == 404:
+                paper_cache.put_xml_text(pmcid, "")
+                return None
+            if resp.status_code != 200 or not resp.content.lstrip().startswith(b"<"):
+                return None
+            xml_bytes = resp.content
+            paper_cache.put(pmcid, "xml", xml_bytes)
+
+        with metrics.stage("parse"):
+            text = jats_to_text(xml_bytes)
+        paper_cache.put_xml_text(pmcid, text)
+        if text.strip():
+            print(f"     Retrieved XML {pmcid}")
+            return text
     except Exception as e:
-        print(f"      Failed to fetch/parse PDF {pmcid}: {e}")
+        print(f"      Failed to fetch/parse XML {pmcid}: {e}")
     return None
 
+
+async def fetch_paper_async(pmcid: str):
+    """Full text of a paper: JATS XML when available (unless PAPER_SOURCE=pdf), else the parsed PDF."""
+    await run_control.checkpoint()
+    if PAPER_SOURCE != "pdf":
+        text = await asyncio.to_thread(fetch_fulltext_xml, pmcid)
+        if text:
+            return text
+    return await fetch_pdf_async(pmcid)
+
+EMPTY_ANSWERS = (None, "N/A", "[N/A]", "")  # LLM answers that carry no value
+
+
 def parse_llm_output(llm_output, trait):
     """Parse LLM output to extract information for a single trait."""
     lines = llm_output.split('\n')
@@ -89,4 +357,28 @@ def parse_llm_output(llm_output, trait):
             if value.startswith("[") and value.endswith("]"):
                 value = value[1:-1].strip()
             return value
-    return "N/A"
\ No newline at end of file
+    return "N/A"
+
+
+def parse_llm_json_output(llm_output, traits):
+    """Parse a JSON object of trait -> value from LLM output, falling back to line parsing per trait."""
+    values = {}
+    start, end = llm_output.find("{"), llm_output.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(llm_output[start:end + 1])
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            lowered = {str(k).strip().strip("*").lower(): v for k, v in data.items()}
+            for trait in traits:
+                value = lowered.get(trait.strip().lower())
+                if isinstance(value, list):
+                    value = ", ".join(str(v) for v in value)
+                if value is not None:
+                    values[trait] = str(value).strip()
+
+    for trait in traits:
+        if trait not in values:
+            values[trait] = parse_llm_output(llm_output, trait)
+    return values
@@ -0,0 +1,16 @@
+import json
+
+from endpoint_pool import load_endpoints
+
+
+def test_serves_without_model_forwards_requested_model(tmp_path):
+    path = tmp_path / "endpoints.json"
+    path.write_text(json.dumps([
+        {"base_url": "http://gpu1:8000/v1", "serves": ["gpt-4.1-mini", "gpt-5-nano"]},
+        {"base_url": "http://gpu2:8000/v1"},
+    ]))
+    cascade, default = load_endpoints(str(path), "gpt-4.1-mini", required=("gpt-4.1-mini", "gpt-5-nano"))
+    assert cascade.model_for("gpt-5-nano") == "gpt-5-nano"
+    assert cascade.model_for("gpt-4.1-mini") == "gpt-4.1-mini"
+    assert default.model_for("gpt-4.1-mini") == "gpt-4.1-mini"
+    assert not default.accepts("gpt-5-nano")
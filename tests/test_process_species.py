@@ -0,0 +1,34 @@
+import asyncio
+
+import pubmed_query
+from job_store import JobStore
+
+
+def test_abstract_tier_keeps_iucn_and_resumed_traits(monkeypatch):
+    monkeypatch.setattr(pubmed_query, "ABSTRACT_TIER", True)
+
+    async def candidates(species, trait, trait_desc, store):
+        return ["PMC1"]
+
+    async def abstract_answers(species, trait, pmcids, trait_desc="", **kwargs):
+        return {"PMC1": "12"}
+
+    async def species_answers(species, traits, pmcids, trait_descriptions=None, answers=None, **kwargs):
+        return answers
+
+    async def consensus(species, trait, answers):
+        return answers[0]
+
+    monkeypatch.setattr(pubmed_query, "_candidates", candidates)
+    monkeypatch.setattr(pubmed_query, "collect_abstract_answers", abstract_answers)
+    monkeypatch.setattr(pubmed_query, "collect_species_answers", species_answers)
+    monkeypatch.setattr(pubmed_query, "_consensus", consensus)
+
+    store = JobStore(":memory:")
+    store.start_pair("Genus species", "Litter Size", "")
+    store.save_result("Genus species", "Litter Size", "4")
+    traits = ["Body Mass", "Brain Mass", "Litter Size"]
+    values = asyncio.run(pubmed_query.process_species(
+        "Genus species", traits, iucn_values={"Brain Mass": "43.0 g"}, store=store
+    ))
+    assert values == {"Litter Size": "4", "Brain Mass": "43.0 g", "Body Mass": "12"}
@@ -0,0 +1,38 @@
+import pubmed_query
+import utils
+from search_cache import SearchCache
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeEuropePMC:
+    def __init__(self):
+        self.searches = []
+
+    def get(self, url, params=None, **kwargs):
+        self.searches.append(params)
+        articles = [{"pmcid": f"PMC{i}", "title": "Genus species body mass", "abstractText": "Body mass of Genus species.",
+                     "isOpenAccess": "Y", "inEPMC": "Y"} for i in range(3)]
+        return FakeResponse({"hitCount": 3, "resultList": {"result": articles}})
+
+
+def test_screened_extraction_reuses_sanity_check_search(monkeypatch, tmp_path):
+    europe_pmc = FakeEuropePMC()
+    monkeypatch.setattr(utils, "http_client", europe_pmc)
+    monkeypatch.setattr(utils, "search_cache", SearchCache(":memory:"))
+    monkeypatch.setattr(pubmed_query, "PAPER_SCREENING", True)
+    monkeypatch.setattr(pubmed_query, "get_iucn_synonyms", lambda genus, species: [])
+
+    pubmed_query.sanity_check(["Genus species"], ["Body Mass"], str(tmp_path / "availability.txt"))
+    assert len(europe_pmc.searches) == 1
+    assert pubmed_query.find_candidates("Genus species", "Body Mass")
+    assert len(europe_pmc.searches) == 1